@@ -0,0 +1,283 @@
+import io
+import wave
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from app.config import settings
+from app.metrics import counter
+
+# NumPy is imported on the first decodable upload rather than at start-up.
+# Preprocessing is optional; uploads are sent unchanged without it.
+np = None
+_numpy_missing = False
+
+
+def numpy_available() -> bool:
+    global np, _numpy_missing
+    if np is None and not _numpy_missing:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            _numpy_missing = True
+    return np is not None
+
+
+STT_AUDIO_BYTES = counter(
+    "willmo_stt_audio_bytes_total",
+    "Speech-to-text audio bytes as received and as sent upstream after preprocessing",
+    ["stage"]
+)
+
+# Decoded audio is produced in blocks of this length, so a long upload is never
+# expanded to float samples at its original rate and channel count all at once
+DECODE_BLOCK_SECONDS = 10
+
+
+class AudioTooLongError(ValueError):
+    def __init__(self, seconds: float):
+        super().__init__(f"Audio is {seconds:.0f} s long (max {settings.STT_MAX_AUDIO_SECONDS:.0f} s)")
+        self.seconds = seconds
+
+
+class DecodedAudio(NamedTuple):
+    rate: int
+    frames: Optional[int]  # Total length when the container says, else None
+    blocks: Iterator["np.ndarray"]  # float32 in [-1, 1], shaped (frames,) or (frames, channels)
+
+
+# A decoder reads an upload (a binary file positioned at its start) and returns
+# DecodedAudio whose blocks span at most DECODE_BLOCK_SECONDS each, or None if it
+# cannot decode the file.
+Decoder = Callable[[BinaryIO], Optional[DecodedAudio]]
+
+_DECODERS: Dict[str, Decoder] = {}
+
+
+def register_decoder(extensions, decoder: Decoder):
+    """
+    Make preprocessing available for more formats, e.g. an ffmpeg- or
+    soundfile-based decoder for mp3/m4a. Extensions are given without the dot.
+    """
+    for ext in extensions:
+        _DECODERS[ext.lower().lstrip(".")] = decoder
+
+
+def decoder_for(filename: str, content_type: Optional[str] = None) -> Optional[Decoder]:
+    if not settings.AUDIO_PREPROCESS_ENABLED or not numpy_available():
+        return None
+    ext = Path(filename).suffix.lower().lstrip(".")
+    if ext in _DECODERS:
+        return _DECODERS[ext]
+    if content_type in ("audio/wav", "audio/x-wav", "audio/wave"):
+        return _DECODERS.get("wav")
+    return None
+
+
+def _pcm_to_float(raw: bytes, width: int, channels: int) -> "np.ndarray":
+    raw = raw[: len(raw) - len(raw) % (width * channels)]
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        bytes3 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        ints = (bytes3[:, 0].astype(np.int32) | (bytes3[:, 1].astype(np.int32) << 8) | (bytes3[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    else:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    return samples.reshape(-1, channels) if channels > 1 else samples
+
+
+def decode_wav(file_obj: BinaryIO) -> Optional[DecodedAudio]:
+    """Decode integer PCM WAV (8/16/24/32-bit). Float and compressed WAVs return None."""
+    try:
+        wav = wave.open(file_obj, "rb")
+    except (wave.Error, EOFError):
+        return None
+    channels = wav.getnchannels()
+    width = wav.getsampwidth()
+    rate = wav.getframerate()
+    if width not in (1, 2, 3, 4) or not rate:
+        wav.close()
+        return None
+
+    def blocks() -> Iterator["np.ndarray"]:
+        with wav:
+            while True:
+                raw = wav.readframes(rate * DECODE_BLOCK_SECONDS)
+                if not raw:
+                    return
+                yield _pcm_to_float(raw, width, channels)
+
+    return DecodedAudio(rate, wav.getnframes(), blocks())
+
+
+register_decoder(["wav", "wave"], decode_wav)
+
+
+def to_mono(samples: "np.ndarray") -> "np.ndarray":
+    return samples.mean(axis=1, dtype=np.float32) if samples.ndim == 2 else samples
+
+
+def resample(samples: "np.ndarray", rate: int, target_rate: int) -> "np.ndarray":
+    """Linear-interpolation resampling, with a box filter first when downsampling to limit aliasing."""
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    if rate > target_rate:
+        width = int(round(rate / target_rate))
+        if width > 1:
+            samples = np.convolve(samples, np.ones(width, dtype=np.float32) / width, mode="same")
+    duration = len(samples) / rate
+    target_len = max(1, int(round(duration * target_rate)))
+    positions = np.linspace(0, len(samples) - 1, target_len)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def frame_energies_db(samples: "np.ndarray", rate: int, frame_ms: int) -> "np.ndarray":
+    """RMS level of consecutive frames in dBFS."""
+    frame_len = max(1, int(rate * frame_ms / 1000))
+    frames = len(samples) // frame_len
+    if frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    blocks = samples[: frames * frame_len].reshape(frames, frame_len)
+    rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def speech_frames(energies_db: "np.ndarray") -> "np.ndarray":
+    """
+    Energy VAD: a frame is speech when it is above the absolute threshold and
+    clearly above the recording's noise floor (its quietest 10% of frames).
+    """
+    if len(energies_db) == 0:
+        return np.zeros(0, dtype=bool)
+    noise_floor = np.percentile(energies_db, 10)
+    threshold = max(settings.AUDIO_VAD_THRESHOLD_DB, noise_floor + settings.AUDIO_VAD_NOISE_MARGIN_DB)
+    return energies_db > threshold
+
+
+def trim_silence(samples: "np.ndarray", rate: int) -> "np.ndarray":
+    """Drop leading and trailing silence, keeping AUDIO_VAD_PADDING_MS around the speech."""
+    frame_ms = settings.AUDIO_VAD_FRAME_MS
+    voiced = np.flatnonzero(speech_frames(frame_energies_db(samples, rate, frame_ms)))
+    if len(voiced) == 0:
+        # Nothing recognisable as speech; let Whisper decide rather than sending nothing
+        return samples
+    frame_len = int(rate * frame_ms / 1000)
+    padding = int(rate * settings.AUDIO_VAD_PADDING_MS / 1000)
+    start = max(0, voiced[0] * frame_len - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame_len + padding)
+    return samples[start:end]
+
+
+def encode_wav(samples: "np.ndarray", rate: int) -> bytes:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def load_pcm(file_obj: BinaryIO, decoder: Decoder) -> Optional["np.ndarray"]:
+    """
+    Decode and normalize to mono float32 at AUDIO_TARGET_SAMPLE_RATE, one block at
+    a time, so memory is the (small) result plus one block. Raises
+    AudioTooLongError past STT_MAX_AUDIO_SECONDS: before decoding when the
+    container states its length, else as soon as the limit is crossed.
+    """
+    decoded = decoder(file_obj)
+    if decoded is None:
+        return None
+    target_rate = settings.AUDIO_TARGET_SAMPLE_RATE
+    max_samples = int(settings.STT_MAX_AUDIO_SECONDS * target_rate)
+    if decoded.frames is not None and decoded.frames / decoded.rate > settings.STT_MAX_AUDIO_SECONDS:
+        raise AudioTooLongError(decoded.frames / decoded.rate)
+
+    # Blocks are resampled independently; the seam between two blocks shifts
+    # timing by at most a sample, which Whisper cannot hear
+    parts = []
+    total = 0
+    for block in decoded.blocks:
+        part = resample(to_mono(block), decoded.rate, target_rate)
+        total += len(part)
+        if total > max_samples:
+            raise AudioTooLongError(total / target_rate)
+        parts.append(part)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+
+def split_points(samples: "np.ndarray", rate: int) -> List[int]:
+    """
+    Sample offsets at which to cut a long recording into segments of roughly
+    STT_SEGMENT_TARGET_SECONDS, never longer than STT_SEGMENT_MAX_SECONDS.
+
+    Each cut is placed at the quietest stretch (smoothed frame energy) between
+    the target and the maximum length, so words are not split unless the
+    speaker never pauses. Recordings under STT_SEGMENT_MIN_SECONDS are not split.
+    """
+    if len(samples) < settings.STT_SEGMENT_MIN_SECONDS * rate:
+        return []
+    frame_ms = settings.AUDIO_VAD_FRAME_MS
+    frame_len = max(1, int(rate * frame_ms / 1000))
+    energies = frame_energies_db(samples, rate, frame_ms)
+    # ~300 ms moving average, so a cut lands in a pause rather than between syllables
+    window = max(1, 300 // frame_ms)
+    smoothed = np.convolve(energies, np.ones(window) / window, mode="same")
+
+    target = int(settings.STT_SEGMENT_TARGET_SECONDS * 1000 / frame_ms)
+    longest = max(target, int(settings.STT_SEGMENT_MAX_SECONDS * 1000 / frame_ms))
+    shortest = target // 2
+    points = []
+    start = 0
+    while len(energies) - start > longest:
+        low, high = start + shortest, start + longest
+        cut = low + int(np.argmin(smoothed[low:high]))
+        points.append(cut * frame_len)
+        start = cut
+    return points
+
+
+class PreparedAudio(NamedTuple):
+    data: bytes
+    filename: str
+    content_type: str
+    original_bytes: int
+    start_seconds: float
+    end_seconds: float
+
+
+def prepare_segments(file_obj: BinaryIO, size: int, filename: str, decoder: Decoder) -> Optional[List[PreparedAudio]]:
+    """
+    Convert an upload to mono 16 kHz 16-bit WAV for Whisper: one segment for
+    short recordings, several cut at pauses for long ones (see split_points).
+    Leading and trailing silence is trimmed from every segment.
+
+    Returns None when the audio cannot be decoded, or when it is a single
+    segment that would not be smaller, in which case the original bytes should
+    be sent. Raises AudioTooLongError (see load_pcm). CPU-bound; run it on the
+    STT executor.
+    """
+    samples = load_pcm(file_obj, decoder)
+    if samples is None:
+        return None
+    rate = settings.AUDIO_TARGET_SAMPLE_RATE
+    bounds = [0] + split_points(samples, rate) + [len(samples)]
+    stem = Path(filename).stem
+    segments = []
+    for index, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        name = f"{stem}.wav" if len(bounds) == 2 else f"{stem}_{index:03d}.wav"
+        processed = encode_wav(trim_silence(samples[start:end], rate), rate)
+        segments.append(PreparedAudio(processed, name, "audio/wav", size, start / rate, end / rate))
+    if len(segments) == 1 and len(segments[0].data) >= size:
+        return None
+    return segments
+
+
+def record_sizes(original_bytes: int, sent_bytes: int):
+    STT_AUDIO_BYTES.inc(original_bytes, stage="received")
+    STT_AUDIO_BYTES.inc(sent_bytes, stage="sent")
@@ -1,175 +1,524 @@
 from fastapi import HTTPException
+import io
 import os
 import uuid
 import json
+import time
 import asyncio
+import logging
 from pathlib import Path
-from openai import OpenAI
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 from app.config import settings
-import langdetect
+from app.openai_client import get_openai_client
+from app.Voice_assistant.tts_cache import tts_cache
+from app.Voice_assistant.text_chunks import pack_chunks
+from app.single_flight import single_flight_group
+from app.metrics import time_stage, track_upstream
+from app.executors import run_in_executor
+from app.resilience import stt_policy, tts_policy, upstream_http_error
+from app.Voice_assistant import audio_preprocess
+from app.services import lazy_service
+from app.admission import primed
+from app.language import LANGUAGE_NAMES, language_identifier
+
+logger = logging.getLogger(__name__)
+
+# Map gender to OpenAI voice
+VOICE_MAP = {
+    "male": "echo",
+    "female": "sage"
+}
+DEFAULT_VOICE = "coral"
+
+# Content types for the TTS response formats
+AUDIO_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+    "pcm": "audio/L16",
+}
+
+# Formats whose files are plain frame sequences, so chunks can be joined byte-wise
+CONCATENABLE_FORMATS = {"mp3", "aac"}
+
+
+def strip_audio_tags(data: bytes, first: bool, last: bool) -> bytes:
+    """
+    Drop metadata that must not appear mid-stream when joining MP3 chunks:
+    a leading ID3v2 tag on every chunk but the first, and a trailing ID3v1
+    tag on every chunk but the last.
+    """
+    if not first and len(data) >= 10 and data[:3] == b"ID3":
+        # Tag size is a 28-bit syncsafe integer, excluding the 10-byte header
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if not last and len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+class VoiceProfile(NamedTuple):
+    """Everything besides the text that decides how speech sounds (and so its cache entry)."""
+    voice: str
+    language: str
+    instructions: Optional[str]
+
+
+def voice_profile(gender: str, language: str) -> VoiceProfile:
+    """Pick the voice for `gender` (with any per-language override) and language instructions."""
+    gender = gender.lower()
+    voice = settings.TTS_LANGUAGE_VOICES.get(language, {}).get(gender) or VOICE_MAP.get(gender, DEFAULT_VOICE)
+    instructions = None
+    name = LANGUAGE_NAMES.get(language)
+    # tts-1 models do not take instructions
+    if name and settings.TTS_LANGUAGE_INSTRUCTIONS and not settings.TTS_MODEL.startswith("tts-1"):
+        instructions = settings.TTS_LANGUAGE_INSTRUCTIONS.format(language=name)
+    return VoiceProfile(voice, language, instructions)
+
 
 class SpeechService:
     def __init__(self):
-        if not settings.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY is required")
+        # Shared async OpenAI client
+        self.client = get_openai_client()
+        self.cache = tts_cache
+        # Concurrent requests for the same audio (keyed by cache filename) share one synthesis
+        self.inflight = single_flight_group("tts_synthesis")
+
+    @staticmethod
+    def public_audio_url(filename: str) -> str:
+        base_url = getattr(settings, "AUDIO_PUBLIC_URL", None) or getattr(settings, "AUDIO_BASE_URL", None) or "http://localhost:8089"
+        return f"{base_url.rstrip('/')}/audio/{filename}"
 
-        # Use OpenAI client
-        self.client = OpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            base_url=settings.OPENAI_API_BASE
+    @staticmethod
+    def audio_media_type(fmt: Optional[str] = None) -> str:
+        return AUDIO_MEDIA_TYPES.get(fmt or settings.TTS_RESPONSE_FORMAT, "application/octet-stream")
+
+    def _cache_filename(self, text: str, profile: VoiceProfile) -> str:
+        fmt = settings.TTS_RESPONSE_FORMAT
+        cache_key = self.cache.make_key(
+            text, profile.voice, settings.TTS_MODEL, fmt, profile.language, profile.instructions or ""
         )
+        return self.cache.filename_for(cache_key, fmt)
 
-        # Ensure audio directory exists
-        os.makedirs(settings.AUDIO_RESPONSE_PATH, exist_ok=True)
-        print(f"[TTS] Audio directory path: {settings.AUDIO_RESPONSE_PATH}")
-        print(f"[TTS] Audio directory exists: {os.path.exists(settings.AUDIO_RESPONSE_PATH)}")
-        print(f"[TTS] Audio directory is writable: {os.access(settings.AUDIO_RESPONSE_PATH, os.W_OK)}")
+    async def _tts_target(self, text: str, gender: str, language: Optional[str]) -> Tuple[VoiceProfile, str]:
+        """Return the (voice profile, cache filename) used to synthesize `text`."""
+        language = language or await language_identifier.detect_async(text)
+        profile = voice_profile(gender, language)
+        return profile, self._cache_filename(text, profile)
 
-    async def text_to_speech(self, text: str, gender: str = "female") -> str:
-        """Convert text to speech using OpenAI TTS with gender selection and language detection"""
-        try:
-            # Detect language
+    @staticmethod
+    def _speech_request(text: str, profile: VoiceProfile) -> Dict[str, Any]:
+        request = dict(
+            model=settings.TTS_MODEL,
+            voice=profile.voice,
+            input=text,
+            response_format=settings.TTS_RESPONSE_FORMAT
+        )
+        if profile.instructions:
+            request["instructions"] = profile.instructions
+        return request
+
+    async def stream_text_to_speech(
+        self,
+        text: str,
+        gender: str = "female",
+        language: Optional[str] = None
+    ) -> Tuple[str, Optional[AsyncIterator[bytes]]]:
+        """
+        Start streaming synthesized speech for `text`.
+
+        Returns (filename, chunks). On a cache hit `chunks` is None and the
+        cached file can be served directly. Otherwise the upstream stream is
+        already open (so errors surface before any bytes are sent) and `chunks`
+        yields audio as it arrives while teeing it into the cache file. Long
+        texts are synthesized as parallel sentence chunks and streamed in order.
+        `language` is detected from the text when not given.
+        """
+        profile, filename = await self._tts_target(text, gender, language)
+        if self.cache.lookup(filename):
+            return filename, None
+
+        chunks = self._tts_chunks(text)
+        if len(chunks) > 1:
+            tasks = self._start_chunks(chunks, profile)
             try:
-                detected_lang = langdetect.detect(text)
-            except:
-                detected_lang = "en"  # fallback to English
-            
-            # Map gender to OpenAI voice
-            voice_map = {
-                "male": "echo",
-                "female": "sage"
-            }
-            
-            voice = voice_map.get(gender.lower(), "coral")
-            
-            # Generate unique filename
-            filename = f"response_{uuid.uuid4()}.mp3"
-            file_path = os.path.join(settings.AUDIO_RESPONSE_PATH, filename)
-            
-            # Enhanced logging for debugging file paths
-            print(f"[TTS] Audio path configuration:")
-            print(f"[TTS] - AUDIO_RESPONSE_PATH: {settings.AUDIO_RESPONSE_PATH}")
-            print(f"[TTS] - Target file path: {file_path}")
-            print(f"[TTS] - Path exists: {os.path.exists(settings.AUDIO_RESPONSE_PATH)}")
-            print(f"[TTS] - Path is writable: {os.access(settings.AUDIO_RESPONSE_PATH, os.W_OK)}")
-            print(f"[TTS] - Path absolute: {os.path.abspath(settings.AUDIO_RESPONSE_PATH)}")
-            
-            # Use streaming response to write directly to file
-            def sync_write():
-                with self.client.audio.speech.with_streaming_response.create(
-                    model="gpt-4o-mini-tts",
-                    voice=voice,
-                    input=text
-                ) as response:
-                    response.stream_to_file(str(file_path))
-            
-            # Run the sync operation in the background
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, sync_write)
-            
-            # Enhanced logging for file save verification
-            file_exists = os.path.exists(file_path)
-            file_size = os.path.getsize(file_path) if file_exists else 0
-            print(f"[TTS] File save status:")
-            print(f"[TTS] - Path: {file_path}")
-            print(f"[TTS] - Exists: {file_exists}")
-            print(f"[TTS] - Size: {file_size} bytes")
-            print(f"[TTS] - Readable: {os.access(file_path, os.R_OK) if file_exists else False}")
-            
-            if not file_exists or file_size == 0:
-                raise HTTPException(status_code=500, detail=f"Failed to save audio file or file is empty at: {file_path}")
-            
+                # Wait for the first chunk so a failing upstream is reported before streaming
+                await tasks[0]
+            except Exception as e:
+                for task in tasks:
+                    task.cancel()
+                raise HTTPException(status_code=500, detail=f"Error converting text to speech: {str(e)}")
+            return filename, await primed(self._relay_chunks(tasks, filename))
+
+        async def open_stream():
+            stream_ctx = self.client.audio.speech.with_streaming_response.create(**self._speech_request(text, profile))
+            return stream_ctx, await stream_ctx.__aenter__()
+
+        try:
+            with track_upstream("tts_stream"):
+                stream_ctx, response = await tts_policy.call(open_stream, hedge=False)
+        except Exception as e:
+            raise upstream_http_error(e, "Error converting text to speech") or HTTPException(
+                status_code=500, detail=f"Error converting text to speech: {str(e)}"
+            )
+
+        return filename, await primed(self._relay_speech(stream_ctx, response, filename))
+
+    async def _relay_speech(self, stream_ctx, response, filename: str) -> AsyncIterator[bytes]:
+        file_path = self.cache.path_for(filename)
+        part_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        part_file = open(part_path, "wb") if settings.TTS_STREAM_TEE_TO_CACHE else None
+        completed = False
+        try:
+            # Primed (see app.admission.primed), so closing the relay unread still closes the stream
+            yield None
+            async for chunk in response.iter_bytes(settings.TTS_STREAM_CHUNK_SIZE):
+                if part_file:
+                    part_file.write(chunk)
+                yield chunk
+            completed = True
+        finally:
+            await stream_ctx.__aexit__(None, None, None)
+            if part_file:
+                part_file.close()
+                # Only a fully received stream becomes a cache entry
+                if completed and os.path.getsize(part_path) > 0:
+                    os.replace(part_path, file_path)
+                    self.cache.add(filename)
+                elif os.path.exists(part_path):
+                    os.remove(part_path)
+
+    def _tts_chunks(self, text: str) -> List[str]:
+        """Split long text into sentence-aligned chunks that are synthesized in parallel."""
+        if settings.TTS_RESPONSE_FORMAT not in CONCATENABLE_FORMATS or len(text) <= settings.TTS_CHUNK_MAX_CHARS:
+            return [text]
+        return pack_chunks(text, settings.TTS_CHUNK_MAX_CHARS)
+
+    async def text_to_speech(self, text: str, gender: str = "female", language: Optional[str] = None) -> str:
+        """
+        Convert text to speech using OpenAI TTS with gender selection. The voice and
+        pronunciation instructions follow `language`, detected from the text when not given.
+        """
+        try:
+            # Content-addressed filename: identical text/voice/language/model/format reuse one file
+            profile, filename = await self._tts_target(text, gender, language)
+            if self.cache.lookup(filename):
+                return self.public_audio_url(filename)
+
+            start = time.perf_counter()
+            chunks = self._tts_chunks(text)
+            if len(chunks) > 1:
+                await self.inflight.do(filename, lambda: self._synthesize_chunked(chunks, profile, filename))
+            else:
+                await self.inflight.do(filename, lambda: self._synthesize_to_cache(text, profile, filename))
+            logger.info("Speech synthesized", extra={
+                "audio_file": filename,
+                "language": profile.language,
+                "chars": len(text),
+                "chunks": len(chunks),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "sample_rate": settings.LOG_SAMPLE_RATE,
+            })
+
             # Build public URL
-            base_url = getattr(settings, "AUDIO_PUBLIC_URL", None) or getattr(settings, "AUDIO_BASE_URL", None) or "http://localhost:8089"
-            audio_url = f"{base_url.rstrip('/')}/audio/{filename}"
-            print(f"[TTS] Returning public URL: {audio_url}")
-            
-            return audio_url
-            
+            return self.public_audio_url(filename)
+
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error converting text to speech: {str(e)}")
+            raise upstream_http_error(e, "Error converting text to speech") or HTTPException(
+                status_code=500, detail=f"Error converting text to speech: {str(e)}"
+            )
+
+    async def _synthesize_to_cache(self, text: str, profile: VoiceProfile, filename: str):
+        """Synthesize `text` with one upstream call and publish it as cache entry `filename`."""
+        file_path = self.cache.path_for(filename)
+        part_path = f"{file_path}.{uuid.uuid4().hex}.part"
+
+        # Path diagnostics cost several syscalls, so they only run with LOG_LEVEL=DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("TTS audio path configuration", extra={
+                "audio_dir": os.path.abspath(settings.AUDIO_RESPONSE_PATH),
+                "target_path": file_path,
+                "dir_exists": os.path.exists(settings.AUDIO_RESPONSE_PATH),
+                "dir_writable": os.access(settings.AUDIO_RESPONSE_PATH, os.W_OK),
+            })
+
+        # Stream into a private part file, then publish it atomically under the cache name
+        try:
+            # Upstream time includes receiving the audio into the part file
+            with track_upstream("tts"):
+                await tts_policy.call(lambda: self._download_speech(text, profile, part_path))
+
+            with time_stage("temp_io"):
+                part_size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                if part_size == 0:
+                    raise HTTPException(status_code=500, detail=f"Failed to save audio file or file is empty at: {file_path}")
+                os.replace(part_path, file_path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+        # The part file was checked before publishing; re-verifying is a debug aid
+        if logger.isEnabledFor(logging.DEBUG):
+            with time_stage("file_verify"):
+                file_exists = os.path.exists(file_path)
+                file_size = os.path.getsize(file_path) if file_exists else 0
+                readable = os.access(file_path, os.R_OK) if file_exists else False
+            logger.debug("TTS file saved", extra={
+                "target_path": file_path, "exists": file_exists, "size": file_size, "readable": readable
+            })
+
+        # Raises if the file vanished since it was published
+        self.cache.add(filename)
 
-    def speech_to_text(self, audio_file) -> str:
+    async def _download_speech(self, text: str, profile: VoiceProfile, path: str):
+        async with self.client.audio.speech.with_streaming_response.create(**self._speech_request(text, profile)) as response:
+            await response.stream_to_file(path)
+
+    async def _chunk_file(self, chunk: str, profile: VoiceProfile, semaphore: asyncio.Semaphore) -> str:
+        """Return the cache filename for one chunk, synthesizing it if it is not cached yet."""
+        # Chunks keep the whole text's language rather than re-detecting sentence by sentence
+        filename = self._cache_filename(chunk, profile)
+        if self.cache.lookup(filename):
+            return filename
+        async with semaphore:
+            await self.inflight.do(filename, lambda: self._synthesize_to_cache(chunk, profile, filename))
+        return filename
+
+    def _start_chunks(self, chunks: List[str], profile: VoiceProfile) -> List[asyncio.Task]:
+        semaphore = asyncio.Semaphore(settings.TTS_CHUNK_CONCURRENCY)
+        return [asyncio.create_task(self._chunk_file(chunk, profile, semaphore)) for chunk in chunks]
+
+    async def _synthesize_chunked(self, chunks: List[str], profile: VoiceProfile, filename: str):
+        """Synthesize chunks concurrently and join them, in order, into cache entry `filename`."""
+        tasks = self._start_chunks(chunks, profile)
+        try:
+            chunk_files = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        await run_in_executor("tts", self._join_chunk_files, chunk_files, filename)
+        self.cache.add(filename)
+
+    def _join_chunk_files(self, chunk_files: List[str], filename: str):
+        file_path = self.cache.path_for(filename)
+        part_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        try:
+            with time_stage("temp_io"), open(part_path, "wb") as out:
+                for index, chunk_file in enumerate(chunk_files):
+                    with open(self.cache.path_for(chunk_file), "rb") as f:
+                        out.write(strip_audio_tags(f.read(), first=index == 0, last=index == len(chunk_files) - 1))
+            os.replace(part_path, file_path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    def _read_file(self, filename: str) -> bytes:
+        with open(self.cache.path_for(filename), "rb") as f:
+            return f.read()
+
+    async def _relay_chunks(self, tasks: List[asyncio.Task], filename: str) -> AsyncIterator[bytes]:
+        """Yield each chunk's audio in order as soon as it and all earlier chunks are ready."""
+        try:
+            # Primed (see app.admission.primed), so closing the relay unread still cancels the tasks
+            yield None
+            chunk_files = []
+            for index, task in enumerate(tasks):
+                chunk_file = await task
+                chunk_files.append(chunk_file)
+                data = await run_in_executor("tts", self._read_file, chunk_file)
+                yield strip_audio_tags(data, first=index == 0, last=index == len(tasks) - 1)
+
+            if settings.TTS_STREAM_TEE_TO_CACHE:
+                await run_in_executor("tts", self._join_chunk_files, chunk_files, filename)
+                self.cache.add(filename)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _prepare_upload(file_obj, filename: str, decoder) -> Optional[List[audio_preprocess.PreparedAudio]]:
         """
-        Convert speech to text using OpenAI's Whisper model.
-        Accepts UploadFile or BytesIO. Will handle .filename or .name.
+        Run local preprocessing on the upload, decoding it from the spooled file in
+        blocks rather than reading it into memory. Returns None to send the original.
         """
+        size = SpeechService._upload_size(file_obj)
+        file_obj.seek(0)
+        try:
+            prepared = audio_preprocess.prepare_segments(file_obj, size, filename, decoder)
+        except audio_preprocess.AudioTooLongError:
+            raise
+        except Exception:
+            logger.warning("Preprocessing failed, sending original audio", extra={"audio_file": filename}, exc_info=True)
+            prepared = None
+        sent = sum(len(part.data) for part in prepared) if prepared else size
+        audio_preprocess.record_sizes(size, sent)
+        if prepared:
+            logger.info("Audio preprocessed", extra={
+                "audio_file": filename,
+                "original_bytes": size,
+                "sent_bytes": sent,
+                "segments": len(prepared),
+                "sample_rate": settings.LOG_SAMPLE_RATE,
+            })
+        return prepared
+
+    async def _upload_segments(self, audio_file) -> List[Tuple[str, Any, str, Optional[float], Optional[float]]]:
+        """Return the (filename, file object, content type, start, end) pieces to transcribe, in order."""
         # Derive a filename (prefer .filename, else .name, else default)
         supplied_name = getattr(audio_file, "filename", None) or getattr(audio_file, "name", None) or "audio_file.mp3"
-        ext = Path(supplied_name).suffix or ".mp3"
-        temp_file_path = os.path.join(settings.TEMP_DIR, f"temp_{uuid.uuid4()}{ext}")
+        if not Path(supplied_name).suffix:
+            supplied_name = f"{supplied_name}.mp3"
+        content_type = getattr(audio_file, "content_type", None) or "application/octet-stream"
 
-        try:
-            # Ensure we read from the start for both UploadFile and BytesIO
+        # UploadFile wraps its spooled temp file in .file
+        file_obj = getattr(audio_file, "file", audio_file)
+
+        decoder = audio_preprocess.decoder_for(supplied_name, content_type)
+        if decoder is not None:
+            try:
+                prepared = await run_in_executor("stt", self._prepare_upload, file_obj, supplied_name, decoder)
+            except audio_preprocess.AudioTooLongError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            if prepared:
+                return [
+                    (part.filename, io.BytesIO(part.data), part.content_type, part.start_seconds, part.end_seconds)
+                    for part in prepared
+                ]
+            # Accepted as segmentable, but it could not be decoded: too large to send as-is
+            if self._upload_size(file_obj) > settings.MAX_AUDIO_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Audio file could not be decoded and is over the "
+                    f"{settings.MAX_AUDIO_UPLOAD_BYTES // (1024 * 1024)} MB limit for undecoded audio"
+                )
+        return [(supplied_name, file_obj, content_type, None, None)]
+
+    @staticmethod
+    def _upload_size(file_obj) -> int:
+        file_obj.seek(0, os.SEEK_END)
+        return file_obj.tell()
+
+    async def _transcribe_file(self, filename: str, file_obj, content_type: str, allow_empty: bool = False) -> str:
+        """One Whisper call (with retries) for one file, normalized to plain text."""
+        async def transcribe():
+            # Ensure we read from the start for both UploadFile and BytesIO (again on each retry)
             try:
-                audio_file.seek(0)
+                file_obj.seek(0)
             except Exception:
                 pass
 
-            # Read bytes and persist to a temp file
-            content = audio_file.read()
-            if not content:
-                raise ValueError("Empty audio content")
-            with open(temp_file_path, "wb") as f:
-                f.write(content)
-
             # Call OpenAI Whisper
-            with open(temp_file_path, "rb") as f:
-                response = self.client.audio.transcriptions.create(
-                    model=settings.WHISPER_MODEL,                 # e.g., "whisper-1"
-                    file=f,
-                    response_format=settings.WHISPER_RESPONSE_FORMAT  # e.g., "text" | "json"
-                )
+            return await self.client.audio.transcriptions.create(
+                model=settings.WHISPER_MODEL,                 # e.g., "whisper-1"
+                file=(Path(filename).name, file_obj, content_type),
+                response_format=settings.WHISPER_RESPONSE_FORMAT  # e.g., "text" | "json"
+            )
 
-            # Normalize response by format
-            fmt = (settings.WHISPER_RESPONSE_FORMAT or "text").lower()
-
-            # If SDK returns a simple string
-            if isinstance(response, str):
-                if fmt == "json":
-                    try:
-                        data = json.loads(response)
-                        text = data.get("text", "")
-                    except json.JSONDecodeError:
-                        text = response.strip()
-                else:
-                    text = response.strip()
-                if not text:
-                    raise ValueError("No transcription received from Whisper")
-                return text
-
-            # If SDK returns an object with .text (common)
-            if hasattr(response, "text"):
-                text = getattr(response, "text") or ""
-                if not text and fmt == "json" and hasattr(response, "json"):
-                    try:
-                        data = response.json()  # type: ignore
-                        text = data.get("text", "")
-                    except Exception:
-                        pass
-                if not text:
-                    raise ValueError("No transcription received from Whisper")
-                return text
-
-            # If SDK returns a dict-like
-            if isinstance(response, dict):
-                text = response.get("text", "")
-                if not text:
-                    raise ValueError("No transcription received from Whisper")
-                return text
+        with track_upstream("stt"):
+            response = await stt_policy.call(transcribe)
+
+        # Normalize response by format
+        fmt = (settings.WHISPER_RESPONSE_FORMAT or "text").lower()
 
+        # If SDK returns a simple string
+        if isinstance(response, str):
+            if fmt == "json":
+                try:
+                    data = json.loads(response)
+                    text = data.get("text", "")
+                except json.JSONDecodeError:
+                    text = response.strip()
+            else:
+                text = response.strip()
+        # If SDK returns an object with .text (common)
+        elif hasattr(response, "text"):
+            text = getattr(response, "text") or ""
+            if not text and fmt == "json" and hasattr(response, "json"):
+                try:
+                    data = response.json()  # type: ignore
+                    text = data.get("text", "")
+                except Exception:
+                    pass
+        # If SDK returns a dict-like
+        elif isinstance(response, dict):
+            text = response.get("text", "")
+        else:
             # Fallback: unknown type
             raise ValueError(f"Unexpected response type: {type(response)}")
 
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error converting speech to text: {str(e)}")
+        if not text and not allow_empty:
+            raise ValueError("No transcription received from Whisper")
+        return text.strip()
+
+    async def iter_transcription(self, audio_file) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Transcribe an upload, yielding one event per segment as soon as it finishes:
+        {"type": "segment", "index", "count", "start", "end", "text"}, plus "error"
+        for a segment that still failed after retries.
+
+        Long decodable recordings are split at pauses (see audio_preprocess) and the
+        segments are transcribed concurrently, at most STT_SEGMENT_CONCURRENCY at a
+        time; anything else is a single segment. Events arrive in completion order;
+        use "index" to put the text back in order.
+        """
+        segments = await self._upload_segments(audio_file)
+        count = len(segments)
+        semaphore = asyncio.Semaphore(settings.STT_SEGMENT_CONCURRENCY)
 
+        async def run(index: int, segment) -> Dict[str, Any]:
+            filename, file_obj, content_type, start, end = segment
+            event = {
+                "type": "segment",
+                "index": index,
+                "count": count,
+                "start": round(start, 3) if start is not None else None,
+                "end": round(end, 3) if end is not None else None,
+            }
+            async with semaphore:
+                try:
+                    # A pause-only segment of a longer recording may legitimately be empty
+                    event["text"] = await self._transcribe_file(filename, file_obj, content_type, allow_empty=count > 1)
+                except Exception as e:
+                    error = upstream_http_error(e, "Error converting speech to text")
+                    event["text"] = ""
+                    event["error"] = error.detail if error is not None else f"Error converting speech to text: {str(e)}"
+                    event["status_code"] = error.status_code if error is not None else 500
+                    event["headers"] = error.headers if error is not None else None
+            return event
+
+        tasks = [asyncio.create_task(run(index, segment)) for index, segment in enumerate(segments)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
         finally:
-            try:
-                if os.path.exists(temp_file_path):
-                    os.remove(temp_file_path)
-            except Exception:
-                pass
+            for task in tasks:
+                task.cancel()
+
+    async def speech_to_text(self, audio_file) -> str:
+        """
+        Convert speech to text using OpenAI's Whisper model.
+        Accepts UploadFile or any binary file object (e.g. BytesIO). Will handle .filename or .name.
+        Formats with a registered decoder (PCM WAV by default) are converted to trimmed
+        mono 16 kHz first, and long recordings are transcribed as concurrent segments;
+        anything else is streamed to Whisper as-is, without copying it into memory or
+        a temp file.
+        """
+        texts: Dict[int, str] = {}
+        async for event in self.iter_transcription(audio_file):
+            if "error" in event:
+                raise HTTPException(status_code=event["status_code"], detail=event["error"], headers=event["headers"])
+            texts[event["index"]] = event["text"]
+
+        text = " ".join(texts[index] for index in sorted(texts) if texts[index])
+        if not text:
+            raise HTTPException(
+                status_code=500,
+                detail="Error converting speech to text: No transcription received from Whisper"
+            )
+        return text
 
-# Create service instance
-speech_service = SpeechService()
\ No newline at end of file
+# Built on first use (see app/services.py)
+speech_service = lazy_service("speech", SpeechService)
\ No newline at end of file
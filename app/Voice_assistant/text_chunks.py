@@ -0,0 +1,93 @@
+import re
+from typing import List, Optional
+
+
+# End of a sentence: terminal punctuation (Latin, CJK, Devanagari/Bengali danda)
+# followed by whitespace, or a line break
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?。！？।])\s+|\n+")
+
+# A period after a title, a common Latin abbreviation or an initial does not end
+# the sentence ("Dr. Smith", "e.g. tea", "J. R. R. Tolkien"). Decimals never match
+# _SENTENCE_END_RE since no whitespace follows their period.
+_ABBREVIATION_RE = re.compile(r"(?<![\w.])(?:Mr|Mrs|Ms|Dr|Prof|Sr|Jr|St|vs|e\.g|i\.e|cf|approx|[A-Z])\.$")
+
+# Sentences shorter than this are merged with the next one so TTS is not
+# called for fragments like "Sure!"
+MIN_SENTENCE_CHARS = 40
+
+
+def split_sentences(text: str, min_chars: int = MIN_SENTENCE_CHARS) -> List[str]:
+    """Split text into sentences, merging very short ones with their successor."""
+    buffer = SentenceBuffer(min_chars)
+    sentences = buffer.feed(text)
+    tail = buffer.flush()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+class SentenceBuffer:
+    """
+    Incrementally splits streamed text into complete sentences.
+
+    feed() returns the sentences completed by the new text; the unfinished
+    remainder is kept until more text arrives or flush() is called.
+    """
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._pending = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._pending += text
+        sentences: List[str] = []
+        start = 0
+        current = ""
+        for match in _SENTENCE_END_RE.finditer(self._pending):
+            if "\n" not in match.group() and _ABBREVIATION_RE.search(self._pending, max(0, match.start() - 8), match.start()):
+                continue
+            current += self._pending[start:match.start()] + " "
+            start = match.end()
+            if len(current.strip()) >= self.min_chars:
+                sentences.append(current.strip())
+                current = ""
+        self._pending = current + self._pending[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        remainder = self._pending.strip()
+        self._pending = ""
+        return remainder or None
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    # A single sentence over the limit is split at word boundaries, and a word
+    # over the limit (e.g. a URL) at max_chars
+    pieces: List[str] = []
+    current = ""
+    words = (word[i:i + max_chars] for word in sentence.split() for i in range(0, len(word), max_chars))
+    for word in words:
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def pack_chunks(text: str, max_chars: int) -> List[str]:
+    """Group whole sentences into chunks of at most `max_chars` characters, in order."""
+    chunks: List[str] = []
+    current = ""
+    for sentence in split_sentences(text, min_chars=0):
+        for piece in ([sentence] if len(sentence) <= max_chars else _split_long(sentence, max_chars)):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
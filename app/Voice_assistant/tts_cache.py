@@ -0,0 +1,85 @@
+import os
+import hashlib
+import unicodedata
+from typing import Optional, Dict, Any
+
+from app.audio_store import AudioStore, audio_store
+from app.metrics import CACHE_LOOKUPS
+
+
+CACHE_FILE_PREFIX = "tts_"
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share one cache entry."""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+class TTSCache:
+    """
+    Content-addressed cache of synthesized audio files.
+
+    Files live in AUDIO_RESPONSE_PATH as `tts_<sha256>.<format>`, where the hash
+    covers the normalized text, voice, TTS model, audio format, language and
+    pronunciation instructions. Storage,
+    expiry and the size quota are handled by the shared AudioStore; this class
+    adds the naming scheme and hit/miss accounting.
+    """
+
+    def __init__(self, store: AudioStore):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, voice: str, model: str, fmt: str, language: str = "", instructions: str = "") -> str:
+        payload = "\x1f".join([normalize_text(text), voice, model, fmt, language, instructions])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def filename_for(key: str, fmt: str) -> str:
+        return f"{CACHE_FILE_PREFIX}{key}.{fmt}"
+
+    def path_for(self, filename: str) -> str:
+        return self.store.path_for(filename)
+
+    def lookup(self, filename: str) -> Optional[str]:
+        """
+        Return the cached filename on a hit, else None. A hit counts as a use, so
+        the file's TTL starts over and the returned URL stays valid for a full TTL.
+        """
+        if self.store.touch(filename):
+            self._count(True)
+            return filename
+        if os.path.exists(self.path_for(filename)):
+            # Written by another worker process; adopt it into this process's index
+            self.store.register(filename)
+            self.store.touch(filename)
+            self._count(True)
+            return filename
+        self._count(False)
+        return None
+
+    def _count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        CACHE_LOOKUPS.inc(cache="tts", result="hit" if hit else "miss")
+
+    def add(self, filename: str):
+        """Register a freshly written cache file (may evict older files)."""
+        self.store.register(filename)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "store": self.store.stats(),
+        }
+
+
+tts_cache = TTSCache(audio_store)
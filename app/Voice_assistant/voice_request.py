@@ -8,7 +8,17 @@ from pydantic import BaseModel
 class TTSRequest(BaseModel):
     text: str
     gender: str = "female"  # "male" or "female"
+    language: Optional[str] = None  # ISO 639-1 code such as "es"; detected from the text when omitted
 
 class VoiceToTextResponse(BaseModel):
     transcribed_text: str
-    filename: str
\ No newline at end of file
+    filename: str
+
+class VoiceTurnSegment(BaseModel):
+    text: str
+    audio_url: str
+
+class VoiceTurnResponse(BaseModel):
+    transcribed_text: str
+    answer: str
+    segments: List[VoiceTurnSegment]  # Spoken answer, one audio file per sentence in order
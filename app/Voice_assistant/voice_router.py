@@ -1,20 +1,23 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException
 from fastapi.responses import FileResponse
-import io
+from typing import Optional
+import json
 import os
 
-from app.Voice_assistant.voice_request import VoiceToTextResponse, TTSRequest
+from app.Voice_assistant.voice_request import VoiceToTextResponse, TTSRequest, VoiceTurnResponse, VoiceTurnSegment
+from app.Voice_assistant.voice_turn import run_voice_turn
 from app.Voice_assistant.speech_service import speech_service
+from app.Voice_assistant import audio_preprocess
+from app.config import settings
+from app.metrics import time_stage
+from app.admission import AdmittedStreamingResponse, stt_admission, tts_admission, voice_turn_admission
+from app.resilience import PASSTHROUGH_STATUS_CODES
 
 router = APIRouter(tags=["Voice Assistant"])
 
 
-@router.post("/voice-to-text", response_model=VoiceToTextResponse, summary="Convert voice to text")
-async def convert_voice_to_text(audio: UploadFile = File(...)):
-    """Convert uploaded voice file to text using Whisper"""
-
-    # Allowed MIME types for MP3, WAV, and AAC
-    allowed_types = {
+# Allowed MIME types for MP3, WAV, and AAC
+ALLOWED_AUDIO_TYPES = {
     "audio/mpeg",      # MP3
     "audio/wav",       # WAV
     "audio/aac",       # AAC
@@ -22,25 +25,45 @@ async def convert_voice_to_text(audio: UploadFile = File(...)):
     "audio/x-m4a",     # Another M4A MIME
     "audio/vnd.dlna.adts",  # AAC (ADTS container - Android)
     "application/octet-stream"  # fallback when client doesn't send proper type
-    }
+}
 
 
+def _validate_audio_upload(audio: UploadFile):
+    """Check type and size of an uploaded voice file without reading it into memory."""
     # Validate content type
-    if not audio.content_type or audio.content_type not in allowed_types:
+    if not audio.content_type or audio.content_type not in ALLOWED_AUDIO_TYPES:
         raise HTTPException(
             status_code=400,
             detail=f"Unsupported file type: {audio.content_type}. Allowed types are: MP3, WAV, AAC."
         )
 
-    try:
-        audio_content = await audio.read()
-        if not audio_content:
-            raise HTTPException(status_code=400, detail="Audio file is empty")
+    # Work on the upload's spooled file directly; no extra in-memory copy
+    audio_size = audio.size
+    if audio_size is None:
+        with time_stage("temp_io"):
+            audio.file.seek(0, os.SEEK_END)
+            audio_size = audio.file.tell()
+    if not audio_size:
+        raise HTTPException(status_code=400, detail="Audio file is empty")
+    # Formats we decode are segmented before Whisper; anything else is sent as-is
+    segmentable = audio_preprocess.decoder_for(audio.filename or "", audio.content_type) is not None
+    max_bytes = settings.MAX_SEGMENTABLE_UPLOAD_BYTES if segmentable else settings.MAX_AUDIO_UPLOAD_BYTES
+    if audio_size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Audio file is too large (max {max_bytes // (1024 * 1024)} MB)")
+
 
-        audio_file = io.BytesIO(audio_content)
-        audio_file.name = audio.filename or "audio_file.mp3"
+def _language(request: TTSRequest) -> Optional[str]:
+    return request.language.strip().lower() if request.language and request.language.strip() else None
 
-        transcribed_text = speech_service.speech_to_text(audio_file)
+
+@router.post("/voice-to-text", response_model=VoiceToTextResponse, summary="Convert voice to text")
+async def convert_voice_to_text(audio: UploadFile = File(...)):
+    """Convert uploaded voice file to text using Whisper"""
+    _validate_audio_upload(audio)
+
+    try:
+        async with stt_admission.slot():
+            transcribed_text = await speech_service.speech_to_text(audio)
 
         if not transcribed_text:
             raise HTTPException(status_code=500, detail="No transcription received from service")
@@ -50,12 +73,77 @@ async def convert_voice_to_text(audio: UploadFile = File(...)):
             filename=audio.filename
         )
 
+    except HTTPException as he:
+        if he.status_code < 500 or he.status_code in PASSTHROUGH_STATUS_CODES:
+            raise
+        raise HTTPException(status_code=500, detail=f"Error processing audio: {he.detail}")
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
 
 
+@router.post("/voice-to-text/stream", summary="Stream transcription segment by segment")
+async def stream_voice_to_text(audio: UploadFile = File(...)):
+    """
+    Transcribe the uploaded audio and stream NDJSON: one `segment` line per
+    transcribed segment as it finishes (long recordings are split at pauses and
+    transcribed concurrently, so lines can arrive out of order; sort by `index`),
+    then a `done` line with the full text in order.
+    """
+    _validate_audio_upload(audio)
+
+    # The admission slot is held until the stream finishes
+    await stt_admission.acquire()
+    events = speech_service.iter_transcription(audio)
+    # Wait for the first segment before responding: it surfaces errors on single-segment
+    # uploads as a proper HTTP error, and the upload is fully read by then
+    try:
+        first_event = await events.__anext__()
+    except HTTPException:
+        stt_admission.release()
+        raise
+    except Exception as e:
+        stt_admission.release()
+        raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+    if "error" in first_event and first_event["count"] == 1:
+        stt_admission.release()
+        await events.aclose()
+        raise HTTPException(
+            status_code=first_event["status_code"], detail=first_event["error"], headers=first_event["headers"]
+        )
+
+    async def ndjson_lines():
+        texts = {}
+        event = first_event
+        try:
+            while True:
+                texts[event["index"]] = event["text"]
+                event.pop("headers", None)
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+                try:
+                    event = await events.__anext__()
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    yield json.dumps({"type": "error", "detail": f"Error processing audio: {str(e)}"}) + "\n"
+                    return
+        finally:
+            # Cancels segments still in flight if the client disconnects
+            await events.aclose()
+        transcribed_text = " ".join(texts[index] for index in sorted(texts) if texts[index])
+        yield json.dumps({"type": "done", "transcribed_text": transcribed_text, "filename": audio.filename}, ensure_ascii=False) + "\n"
+
+    return AdmittedStreamingResponse(
+        stt_admission,
+        ndjson_lines(),
+        # Cancels segments still in flight even if the body never started
+        on_close=events.aclose,
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/text-to-speech", summary="Convert text to speech")
 async def convert_text_to_speech(request: TTSRequest):
     """Convert text to speech and return audio file with gender selection"""
@@ -67,8 +155,119 @@ async def convert_text_to_speech(request: TTSRequest):
 
     try:
         # Call the async text_to_speech method
-        audio_url = await speech_service.text_to_speech(request.text, request.gender)
+        async with tts_admission.slot():
+            audio_url = await speech_service.text_to_speech(request.text, request.gender, _language(request))
         return {"audio_url": audio_url}
         
+    except HTTPException as he:
+        if he.status_code in PASSTHROUGH_STATUS_CODES:
+            raise
+        raise HTTPException(status_code=500, detail=f"Error converting text to speech: {str(he)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error converting text to speech: {str(e)}")
+
+@router.post("/text-to-speech/stream", summary="Stream text to speech audio")
+async def stream_text_to_speech(request: TTSRequest):
+    """
+    Stream synthesized audio as it is generated so playback can start on the first bytes.
+    The X-Audio-URL header carries the URL the same audio is cached under.
+    """
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+
+    if request.gender not in ["male", "female"]:
+        raise HTTPException(status_code=400, detail="Gender must be 'male' or 'female'")
+
+    # The admission slot is held until the audio stream finishes
+    await tts_admission.acquire()
+    try:
+        filename, chunks = await speech_service.stream_text_to_speech(request.text, request.gender, _language(request))
+    except HTTPException:
+        tts_admission.release()
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error converting text to speech: {str(e)}")
\ No newline at end of file
+        tts_admission.release()
+        raise HTTPException(status_code=500, detail=f"Error converting text to speech: {str(e)}")
+
+    # X-Accel-Buffering stops nginx from holding the stream back until it completes
+    headers = {"X-Audio-URL": speech_service.public_audio_url(filename), "X-Accel-Buffering": "no"}
+    media_type = speech_service.audio_media_type()
+    if chunks is None:
+        tts_admission.release()
+        return FileResponse(speech_service.cache.path_for(filename), media_type=media_type, headers=headers)
+    # `chunks` is the (primed) body itself, so closing the body closes the upstream stream
+    return AdmittedStreamingResponse(tts_admission, chunks, media_type=media_type, headers=headers)
+
+
+@router.post("/turn", response_model=VoiceTurnResponse, summary="Voice in, voice out: STT, chat and TTS in one call")
+async def voice_turn(
+    audio: UploadFile = File(...),
+    user_age: int = Form(..., ge=1, le=120),
+    user_id: Optional[str] = Form(None),
+    gender: str = Form("female"),
+    stream: bool = Form(False)
+):
+    """
+    Transcribe the uploaded audio, answer it with the chat model and synthesize the
+    answer sentence by sentence while it is still being generated.
+
+    With stream=true the response is NDJSON: a `transcript` line, one `segment` line
+    per sentence (in order, each with its audio_url) and a final `done` line.
+    """
+    _validate_audio_upload(audio)
+    if gender not in ["male", "female"]:
+        raise HTTPException(status_code=400, detail="Gender must be 'male' or 'female'")
+
+    events = run_voice_turn(audio, user_age=user_age, user_id=user_id, gender=gender)
+
+    if stream:
+        # The admission slot is held until the stream finishes
+        await voice_turn_admission.acquire()
+        # Surface transcription errors as a proper HTTP error before streaming starts
+        try:
+            first_event = await events.__anext__()
+        except HTTPException:
+            voice_turn_admission.release()
+            raise
+        except Exception as e:
+            voice_turn_admission.release()
+            raise HTTPException(status_code=500, detail=f"Error processing voice turn: {str(e)}")
+
+        async def ndjson_lines():
+            yield json.dumps(first_event, ensure_ascii=False) + "\n"
+            try:
+                async for event in events:
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                yield json.dumps({"type": "error", "detail": f"Error processing voice turn: {detail}"}) + "\n"
+
+        return AdmittedStreamingResponse(
+            voice_turn_admission,
+            ndjson_lines(),
+            on_close=events.aclose,
+            media_type="application/x-ndjson",
+            headers={"X-Accel-Buffering": "no"}
+        )
+
+    try:
+        transcript, answer, segments = "", "", []
+        async with voice_turn_admission.slot():
+            async for event in events:
+                if event["type"] == "transcript":
+                    transcript = event["text"]
+                elif event["type"] == "segment":
+                    segments.append(VoiceTurnSegment(text=event["text"], audio_url=event["audio_url"]))
+                elif event["type"] == "done":
+                    answer = event["answer"]
+        return VoiceTurnResponse(transcribed_text=transcript, answer=answer, segments=segments)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing voice turn: {str(e)}")
+
+
+@router.get("/tts-cache/stats", summary="Text-to-speech cache statistics")
+async def tts_cache_stats():
+    """Return hit/miss counters and current size of the TTS audio cache"""
+    return speech_service.cache.stats()
@@ -0,0 +1,90 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.chat.llm_service import chat_llm_service
+from app.Voice_assistant.speech_service import speech_service
+from app.Voice_assistant.text_chunks import SentenceBuffer
+from app.language import UNDETERMINED, language_identifier
+
+
+async def run_voice_turn(
+    audio,
+    user_age: int,
+    user_id: Optional[str] = None,
+    gender: str = "female"
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    One voice conversation turn: transcribe, chat, and speak the answer.
+
+    TTS for each sentence starts as soon as the chat stream completes it, so
+    synthesis overlaps with generation. The answer is spoken in the language of
+    the transcript (the chat model replies in the user's language), identified
+    once because single sentences are too short to identify reliably.
+    Yields, in order:
+      {"type": "transcript", "text": ..., "language": ...}
+      {"type": "segment", "index": i, "text": ..., "audio_url": ...}  (one per sentence, in order)
+      {"type": "done", "answer": ..., "usage": ...}
+    """
+    transcript = await speech_service.speech_to_text(audio)
+    if not transcript:
+        raise HTTPException(status_code=500, detail="No transcription received from service")
+    language = await language_identifier.detect_async(transcript)
+    yield {"type": "transcript", "text": transcript, "language": language}
+
+    events = await chat_llm_service.stream_response(
+        text=transcript,
+        user_age=user_age,
+        user_id=user_id
+    )
+
+    semaphore = asyncio.Semaphore(settings.VOICE_TURN_TTS_CONCURRENCY)
+
+    async def synthesize(sentence: str) -> str:
+        async with semaphore:
+            # "und" (undetermined) lets each sentence be identified on its own
+            return await speech_service.text_to_speech(sentence, gender, language if language != UNDETERMINED else None)
+
+    sentences = SentenceBuffer()
+    pending: List[tuple] = []  # (index, sentence, task), in sentence order
+    next_index = 0
+
+    def schedule(sentence: str):
+        nonlocal next_index
+        pending.append((next_index, sentence, asyncio.create_task(synthesize(sentence))))
+        next_index += 1
+
+    def ready_segments() -> List[Dict[str, Any]]:
+        # Emit finished segments only from the front, so order is preserved
+        ready = []
+        while pending and pending[0][2].done():
+            index, sentence, task = pending.pop(0)
+            ready.append({"type": "segment", "index": index, "text": sentence, "audio_url": task.result()})
+        return ready
+
+    try:
+        done_event = None
+        async for event in events:
+            if event["type"] == "token":
+                for sentence in sentences.feed(event["delta"]):
+                    schedule(sentence)
+                for segment in ready_segments():
+                    yield segment
+            elif event["type"] == "done":
+                done_event = event
+
+        tail = sentences.flush()
+        if tail:
+            schedule(tail)
+
+        while pending:
+            index, sentence, task = pending.pop(0)
+            yield {"type": "segment", "index": index, "text": sentence, "audio_url": await task}
+
+        if done_event is not None:
+            yield done_event
+    finally:
+        for _, _, task in pending:
+            task.cancel()
@@ -0,0 +1,203 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.metrics import counter, gauge, registry
+
+
+G = TypeVar("G", bound=AsyncGenerator)
+
+ADMISSION_REJECTED = counter(
+    "willmo_admission_rejected_total",
+    "Requests turned away by admission control (queue_full = 429, queue_timeout = 503)",
+    ["endpoint", "reason"]
+)
+ADMISSION_ACTIVE = gauge("willmo_admission_active", "Admitted requests currently running", ["endpoint"])
+ADMISSION_QUEUED = gauge("willmo_admission_queued", "Requests waiting for a slot", ["endpoint"])
+
+
+class AdmissionLimiter:
+    """
+    Concurrency limit with a bounded FIFO wait queue for one endpoint group.
+
+    Up to `max_concurrent` requests run at once and up to `max_queue` more wait
+    for a slot. A request arriving to a full queue gets 429 immediately; one that
+    waits longer than `queue_timeout` gets 503. Both carry Retry-After, so
+    overload turns into fast, explicit backpressure instead of every admitted
+    request getting slower.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    def _reject(self, status_code: int, reason: str, detail: str) -> HTTPException:
+        ADMISSION_REJECTED.inc(endpoint=self.name, reason=reason)
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+    async def acquire(self):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_full += 1
+            raise self._reject(429, "queue_full", f"Too many concurrent {self.name} requests, retry later")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the timeout fired; keep it
+                self.admitted += 1
+                return
+            waiter.cancel()
+            self.rejected_timeout += 1
+            raise self._reject(503, "queue_timeout", f"{self.name} is overloaded, retry later")
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed to us but the caller went away: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+
+    def release(self):
+        # Hand the slot directly to the oldest live waiter, so `active` never dips
+        # below the limit while requests are queued
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.name,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_queue_timeout": self.rejected_timeout,
+        }
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streaming response that holds an already acquired admission slot until it
+    has been sent, then releases it.
+
+    The release happens here rather than in the body generator's `finally`: a
+    client that disconnects before the body is iterated never runs the
+    generator, which would leak the slot. The body is closed at the same point,
+    and `on_close` (e.g. an already started upstream iterator's `aclose`) is
+    awaited for cleanup the unstarted body cannot do.
+    """
+
+    def __init__(
+        self,
+        limiter: AdmissionLimiter,
+        content: AsyncIterator[Any],
+        on_close: Optional[Callable[[], Awaitable[None]]] = None,
+        **kwargs: Any
+    ):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.limiter.release()
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            if self.on_close is not None:
+                await self.on_close()
+
+
+async def primed(stream: G) -> G:
+    """
+    Run an async generator up to its first `yield`, which must yield None.
+
+    A generator that is closed before it is first iterated never runs its
+    `finally`. Relays that hold an upstream connection open start with a bare
+    `yield` inside their `try` and are primed before they are returned, so
+    closing them (e.g. when the client disconnects before the body starts)
+    always releases the connection.
+    """
+    await stream.__anext__()
+    return stream
+
+
+_limiters: List[AdmissionLimiter] = []
+
+
+def admission_limiter(name: str, max_concurrent: int, max_queue: int) -> AdmissionLimiter:
+    """Create a named limiter using the shared queue timeout and Retry-After settings."""
+    limiter = AdmissionLimiter(
+        name,
+        max_concurrent=max_concurrent,
+        max_queue=max_queue,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    )
+    _limiters.append(limiter)
+    return limiter
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    return [limiter.stats() for limiter in _limiters]
+
+
+def _collect_admission():
+    for limiter in _limiters:
+        ADMISSION_ACTIVE.set(limiter.active, endpoint=limiter.name)
+        ADMISSION_QUEUED.set(len(limiter._waiters), endpoint=limiter.name)
+
+
+registry.add_collector(_collect_admission)
+
+
+chat_admission = admission_limiter("chat", settings.CHAT_MAX_CONCURRENT, settings.CHAT_MAX_QUEUE)
+micro_goal_admission = admission_limiter("micro_goal", settings.MICRO_GOAL_MAX_CONCURRENT, settings.MICRO_GOAL_MAX_QUEUE)
+stt_admission = admission_limiter("stt", settings.STT_MAX_CONCURRENT, settings.STT_MAX_QUEUE)
+tts_admission = admission_limiter("tts", settings.TTS_MAX_CONCURRENT, settings.TTS_MAX_QUEUE)
+voice_turn_admission = admission_limiter("voice_turn", settings.VOICE_TURN_MAX_CONCURRENT, settings.VOICE_TURN_MAX_QUEUE)
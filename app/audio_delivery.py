@@ -0,0 +1,77 @@
+import os
+import re
+from typing import Dict
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from app.config import settings
+from app.audio_store import audio_store
+from app.Voice_assistant.speech_service import SpeechService
+
+
+router = APIRouter()
+
+_SAFE_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def etag_for(stat_result: os.stat_result) -> str:
+    """
+    Strong validator from the file's mtime and size.
+
+    Cache file names hash the synthesis request, not the audio: synthesis is
+    not deterministic, so a file evicted and synthesized again under the same
+    name has different bytes. Every write sets a new mtime; uses only move
+    atime (see AudioStore.touch), so the ETag changes
+    exactly when the bytes do.
+    """
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+@router.api_route("/audio/{filename}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_audio(filename: str, request: Request):
+    """
+    Serve a generated audio file with a strong ETag, long-lived caching and Range support.
+
+    When AUDIO_ACCEL_REDIRECT_PREFIX is set, the body is handed off to nginx via
+    X-Accel-Redirect so the worker only validates the name and sets
+    Cache-Control. nginx then sends its own ETag and Last-Modified (also from
+    mtime and size) and answers If-None-Match, If-Range and Range itself, so no
+    ETag is computed here.
+    """
+    if not _SAFE_NAME_RE.match(filename) or filename.startswith(".") or filename.endswith(".part"):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    path = audio_store.path_for(filename)
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not Found")
+    audio_store.touch(filename)
+
+    fmt = os.path.splitext(filename)[1].lstrip(".")
+    headers: Dict[str, str] = {"Cache-Control": settings.AUDIO_CACHE_CONTROL}
+
+    if settings.AUDIO_ACCEL_REDIRECT_PREFIX:
+        headers["X-Accel-Redirect"] = f"{settings.AUDIO_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{filename}"
+        return Response(media_type=SpeechService.audio_media_type(fmt), headers=headers)
+
+    etag = etag_for(stat_result)
+    headers["ETag"] = etag
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(
+        path,
+        media_type=SpeechService.audio_media_type(fmt),
+        headers=headers,
+        stat_result=stat_result,
+    )
@@ -0,0 +1,328 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.metrics import gauge, registry
+
+try:
+    import fcntl
+except ImportError:  # No flock (Windows): every process maintains the store
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+# Leftover part files older than this are from crashed writers
+STALE_PART_SECONDS = 3600
+
+# Held with an exclusive flock by the one process that deletes files
+LOCK_FILENAME = ".maintenance.lock"
+
+
+def _last_used(st: os.stat_result) -> float:
+    # atime is set explicitly on every use (see AudioStore.touch); mtime covers a
+    # file nobody has used since it was written
+    return max(st.st_atime, st.st_mtime)
+
+
+class AudioStore:
+    """
+    Index of the generated audio files in one directory, with bounded disk usage.
+
+    Each file's last use and size are kept in memory (built once at startup by a
+    single directory scan). Files expire TTL seconds after their last use (being
+    written, a cache hit or a download) via an expiry heap, so a URL handed out
+    on a cache hit stays valid for a full TTL. Use is also recorded as the
+    file's atime, so it survives restarts and is visible to other processes;
+    mtime stays the time the content was written, which the ETag is built on.
+    The least recently used files are evicted whenever total size or count
+    exceeds the quota. Eviction runs incrementally as files are registered and
+    periodically on the asyncio loop, touching only the files it evicts.
+
+    With several worker processes (`shared`), each one expires and evicts within
+    its own index (a subset of the directory, so its quota checks never delete
+    too much), re-reading a file's atime first in case another worker used it.
+    The process holding the directory's maintenance lock also rescans the
+    directory each interval, on a thread, to index what the other workers wrote
+    and clear stale part files. The others retry the lock each interval so the
+    rescan survives a worker restart.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl_seconds: float,
+        max_bytes: int,
+        max_files: int,
+        interval_seconds: float,
+        shared: bool = False
+    ):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.interval_seconds = interval_seconds
+        self.shared = shared
+        self.leader = False
+        self._lock_fd: Optional[int] = None
+
+        self._files: Dict[str, Tuple[float, int]] = {}  # name -> (last used, size)
+        self._lru: "OrderedDict[str, None]" = OrderedDict()  # least recently used first
+        self._expiry: List[Tuple[float, str]] = []  # heap of (expires_at, name); stale entries skipped lazily
+        self._total_bytes = 0
+
+        self.expired = 0
+        self.evicted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _try_lead(self) -> bool:
+        """Take the maintenance lock if no other process holds it. Released when the process exits."""
+        if self.leader:
+            return True
+        if fcntl is None:
+            self.leader = True
+            return True
+        fd = os.open(self.path_for(LOCK_FILENAME), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        self.leader = True
+        logger.info("This process runs audio maintenance", extra={"pid": os.getpid()})
+        return True
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """List (last used, name, size) of the files on disk; the leader also removes stale part files. Blocking."""
+        now = time.time()
+        found = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.is_file() or entry.name.startswith("."):
+                        continue
+                    st = entry.stat()
+                    if entry.name.endswith(".part"):
+                        if self.leader and now - st.st_mtime > STALE_PART_SECONDS:
+                            self._remove_file(entry.name)
+                        continue
+                    found.append((_last_used(st), entry.name, st.st_size))
+        except FileNotFoundError:
+            os.makedirs(self.directory, exist_ok=True)
+        return found
+
+    def rebuild(self):
+        """Index the files already on disk (at startup)."""
+        found = self._scan()
+        self._files.clear()
+        self._lru.clear()
+        self._expiry = []
+        self._total_bytes = 0
+        for used, name, size in sorted(found):
+            self._track(name, used, size)
+        self.evict_expired()
+        self._enforce_quota()
+
+    def _merge(self, found: List[Tuple[float, str, int]], scanned_at: float):
+        """
+        Fold a directory scan into the index: adopt files other workers wrote,
+        pick up their uses, and drop files they deleted. Known files keep their
+        place in the LRU unless they were used elsewhere.
+        """
+        on_disk = set()
+        for used, name, size in sorted(found):
+            on_disk.add(name)
+            info = self._files.get(name)
+            if info is None:
+                self._track(name, used, size)
+            elif used > info[0]:
+                self._files[name] = (used, info[1])
+                self._lru.move_to_end(name)
+        # Files registered while the scan ran are not in it
+        gone = [name for name, (used, _) in self._files.items() if name not in on_disk and used < scanned_at]
+        for name in gone:
+            self._forget(name)
+
+    def _used_elsewhere(self, name: str) -> bool:
+        """When shared, check the file's atime before deleting it: another worker may have used it since."""
+        if not self.shared:
+            return False
+        used, size = self._files[name]
+        try:
+            last_used = _last_used(os.stat(self.path_for(name)))
+        except FileNotFoundError:
+            return False
+        if last_used <= used:
+            return False
+        self._files[name] = (last_used, size)
+        self._lru.move_to_end(name)
+        return True
+
+    def _track(self, name: str, used: float, size: int):
+        self._forget(name)
+        self._files[name] = (used, size)
+        self._lru[name] = None
+        heapq.heappush(self._expiry, (used + self.ttl_seconds, name))
+        self._total_bytes += size
+
+    def _forget(self, name: str) -> bool:
+        info = self._files.pop(name, None)
+        if info is None:
+            return False
+        self._lru.pop(name, None)
+        self._total_bytes -= info[1]
+        return True
+
+    def _remove_file(self, name: str):
+        try:
+            os.remove(self.path_for(name))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("Failed to delete audio file", extra={"audio_file": name}, exc_info=True)
+
+    def register(self, name: str, keep: Optional[str] = None):
+        """Record a newly written file, then evict whatever is expired or over quota."""
+        now = time.time()
+        self._track(name, now, os.path.getsize(self.path_for(name)))
+        self.evict_expired(now)
+        self._enforce_quota(keep=keep or name)
+
+    def touch(self, name: str) -> bool:
+        """
+        Mark a file as used now: it moves to the back of the LRU and its TTL starts
+        over. Returns False if it is not (or no longer) stored.
+        """
+        info = self._files.get(name)
+        if info is None:
+            return False
+        now = time.time()
+        path = self.path_for(name)
+        try:
+            # Only atime: mtime marks the content version (see audio_delivery.etag_for)
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            self._forget(name)
+            return False
+        except OSError:
+            logger.warning("Failed to update audio file time", extra={"audio_file": name}, exc_info=True)
+        # The expiry heap is not updated here; evict_expired reschedules entries of used files
+        self._files[name] = (now, info[1])
+        self._lru.move_to_end(name)
+        return True
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Delete files past their TTL. Cost is proportional to the number expired or used since."""
+        now = now or time.time()
+        count = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, name = heapq.heappop(self._expiry)
+            info = self._files.get(name)
+            # Heap entries of evicted files are skipped lazily
+            if info is None:
+                continue
+            expires_at = info[0] + self.ttl_seconds
+            if expires_at > now or self._used_elsewhere(name):
+                # Used since this entry was scheduled
+                heapq.heappush(self._expiry, (self._files[name][0] + self.ttl_seconds, name))
+                continue
+            self._forget(name)
+            self._remove_file(name)
+            count += 1
+        self.expired += count
+        return count
+
+    def _enforce_quota(self, keep: Optional[str] = None):
+        while self._lru and (self._total_bytes > self.max_bytes or len(self._files) > self.max_files):
+            name = next(iter(self._lru))
+            if name == keep:
+                break
+            if self._used_elsewhere(name):
+                continue
+            self._forget(name)
+            self._remove_file(name)
+            self.evicted += 1
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                if self.shared and self._try_lead():
+                    # Stats every file, so it runs off the loop
+                    scanned_at = time.time()
+                    found = await asyncio.to_thread(self._scan)
+                    self._merge(found, scanned_at)
+                    self._enforce_quota()
+                count = self.evict_expired()
+                if count:
+                    logger.info("Expired audio files", extra={"count": count})
+            except Exception:
+                logger.exception("Audio store maintenance failed")
+
+    def start(self):
+        """Index the directory and schedule periodic expiry on the running loop."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._try_lead()
+        self.rebuild()
+        logger.info(
+            "Audio store indexed",
+            extra={"files": len(self._files), "bytes": self._total_bytes, "directory": self.directory}
+        )
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._maintenance_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            self.leader = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "files": len(self._files),
+            "bytes": self._total_bytes,
+            "max_files": self.max_files,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "maintenance_leader": self.leader,
+        }
+
+
+AUDIO_STORE_FILES = gauge("willmo_audio_store_files", "Generated audio files on disk")
+AUDIO_STORE_BYTES = gauge("willmo_audio_store_bytes", "Total size of generated audio files")
+
+
+audio_store = AudioStore(
+    directory=settings.AUDIO_RESPONSE_PATH,
+    ttl_seconds=settings.AUDIO_FILE_TTL_SECONDS,
+    max_bytes=settings.AUDIO_STORE_MAX_BYTES,
+    max_files=settings.AUDIO_STORE_MAX_FILES,
+    interval_seconds=settings.AUDIO_MAINTENANCE_INTERVAL_SECONDS,
+    shared=settings.WEB_CONCURRENCY > 1,
+)
+
+
+def _collect_store_usage():
+    AUDIO_STORE_FILES.set(len(audio_store._files))
+    AUDIO_STORE_BYTES.set(audio_store._total_bytes)
+
+
+registry.add_collector(_collect_store_usage)
@@ -8,7 +8,8 @@ class ChatTextRequest(BaseModel):
     user_age: int = Field(..., ge=1, le=120)
     conversation_history: Optional[List[Dict[str, str]]] = Field(
         None, 
-        description="List of previous conversation messages with user_query and ai_response keys"
+        description="List of previous conversation messages with user_query and ai_response keys. "
+                    "Omit it to use the server-side history stored for user_id"
     )
 
 class ChatTextResponse(BaseModel):
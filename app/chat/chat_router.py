@@ -1,6 +1,10 @@
+import json
 from fastapi import APIRouter, HTTPException
 from app.chat.chat_request import ChatTextRequest, ChatTextResponse
 from app.chat.llm_service import chat_llm_service
+from app.chat.session_store import session_store
+from app.chat.fast_path import fast_path_responder
+from app.admission import AdmittedStreamingResponse, chat_admission
 
 router = APIRouter()
 
@@ -10,17 +14,81 @@ async def chat_text(payload: ChatTextRequest):
     Generate chat response with conversation history support.
     
     The conversation_history should contain previous messages with user_query and ai_response keys.
+    If it is omitted and user_id is set, the server-side session for that user is used instead.
     """
     try:
-        answer = chat_llm_service.generate_response(
-            text=payload.user_query,
-            user_age=payload.user_age,
-            conversation_history=payload.conversation_history
-        )
+        async with chat_admission.slot():
+            answer = await chat_llm_service.generate_response(
+                text=payload.user_query,
+                user_age=payload.user_age,
+                conversation_history=payload.conversation_history,
+                user_id=payload.user_id
+            )
         
         return ChatTextResponse(answer=answer)
         
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating chat response: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error generating chat response: {str(e)}")
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat-text/stream", summary="Streaming text chat (Server-Sent Events)")
+async def chat_text_stream(payload: ChatTextRequest):
+    """
+    Stream the chat response as Server-Sent Events.
+
+    Emits `token` events with {"delta": "..."} as text arrives, then a final `done`
+    event with {"answer": "...", "usage": {...}}. Errors after streaming has
+    started are reported as an `error` event.
+    """
+    # The admission slot is held until the stream finishes
+    await chat_admission.acquire()
+    try:
+        events = await chat_llm_service.stream_response(
+            text=payload.user_query,
+            user_age=payload.user_age,
+            conversation_history=payload.conversation_history,
+            user_id=payload.user_id
+        )
+    except HTTPException:
+        chat_admission.release()
+        raise
+    except Exception as e:
+        chat_admission.release()
+        raise HTTPException(status_code=500, detail=f"Error generating chat response: {str(e)}")
+
+    async def event_source():
+        try:
+            async for event in events:
+                event_type = event.pop("type")
+                yield _sse(event_type, event)
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error generating chat response: {str(e)}"})
+
+    return AdmittedStreamingResponse(
+        chat_admission,
+        event_source(),
+        # Closes the upstream stream even if event_source never started
+        on_close=events.aclose,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/session/{user_id}", summary="Clear a user's server-side conversation history")
+async def clear_chat_session(user_id: str):
+    # Uses the store directly, so clearing history does not build the chat client
+    await session_store.run_io(session_store.clear, user_id)
+    return {"user_id": user_id, "cleared": True}
+
+
+@router.get("/fast-path/stats", summary="Locally answered chat requests")
+async def fast_path_stats():
+    """Return how many chat requests were answered without calling the LLM"""
+    return fast_path_responder.stats()
\ No newline at end of file
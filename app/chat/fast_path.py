@@ -0,0 +1,152 @@
+import unicodedata
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.metrics import CACHE_LOOKUPS
+from app.language import register_known
+
+
+# Normalized phrase -> (intent, language). Phrases are matched against the whole
+# message, so "hello" is answered locally but "hello, plan my day" is not.
+_PHRASES: Dict[str, Tuple[str, str]] = {}
+
+
+def _add(intent: str, lang: str, *phrases: str):
+    for phrase in phrases:
+        _PHRASES[phrase] = (intent, lang)
+
+
+_add("greeting", "en", "hi", "hii", "hiii", "hello", "helo", "hey", "heya", "hiya", "yo", "howdy", "greetings",
+     "good morning", "good afternoon", "good evening", "morning", "hi hi", "hello hello", "hey hey")
+_add("greeting", "es", "hola", "buenos dias", "buenos días", "buenas tardes", "buenas noches", "buenas")
+_add("greeting", "fr", "bonjour", "salut", "bonsoir", "coucou")
+_add("greeting", "de", "hallo", "guten tag", "guten morgen", "guten abend", "servus", "moin")
+_add("greeting", "it", "ciao", "buongiorno", "buonasera")
+_add("greeting", "pt", "ola", "olá", "oi", "bom dia", "boa tarde", "boa noite")
+_add("greeting", "hi", "namaste", "namaskar", "नमस्ते", "नमस्कार")
+_add("greeting", "bn", "নমস্কার", "হ্যালো", "আসসালামু আলাইকুম")
+_add("greeting", "ar", "مرحبا", "اهلا", "السلام عليكم")
+_add("greeting", "ur", "assalamu alaikum", "assalamualaikum", "asalam o alaikum", "salam", "salaam", "adaab")
+_add("greeting", "ru", "привет", "здравствуйте")
+_add("greeting", "tr", "merhaba", "selam")
+_add("greeting", "zh", "你好", "您好")
+_add("greeting", "ja", "こんにちは", "おはよう", "こんばんは")
+_add("greeting", "ko", "안녕하세요", "안녕")
+
+_add("thanks", "en", "thanks", "thank you", "thx", "ty", "thanks a lot", "thank you so much", "many thanks")
+_add("thanks", "es", "gracias", "muchas gracias")
+_add("thanks", "fr", "merci", "merci beaucoup")
+_add("thanks", "de", "danke", "danke schon", "danke schön", "vielen dank")
+_add("thanks", "bn", "ধন্যবাদ")
+
+_add("goodbye", "en", "bye", "goodbye", "bye bye", "see you", "see you later", "good night")
+_add("goodbye", "es", "adios", "adiós", "hasta luego")
+_add("goodbye", "fr", "au revoir")
+_add("goodbye", "de", "tschuss", "tschüss", "auf wiedersehen")
+
+# Words that may follow a greeting without changing its meaning ("hi there", "hello abbie")
+_FILLERS = {"there", "abbie", "everyone", "all", "friend", "buddy", "again", "dear", "assistant"}
+
+_REPLIES: Dict[str, Dict[str, str]] = {
+    "greeting": {
+        "en": "Hello! I am Abbie, your personal Assistant. How can I assist you today?",
+        "es": "¡Hola! Soy Abbie, tu asistente personal. ¿En qué puedo ayudarte hoy?",
+        "fr": "Bonjour ! Je suis Abbie, votre assistante personnelle. Comment puis-je vous aider aujourd'hui ?",
+        "de": "Hallo! Ich bin Abbie, deine persönliche Assistentin. Wie kann ich dir heute helfen?",
+        "it": "Ciao! Sono Abbie, la tua assistente personale. Come posso aiutarti oggi?",
+        "pt": "Olá! Eu sou a Abbie, sua assistente pessoal. Como posso ajudar você hoje?",
+        "hi": "नमस्ते! मैं Abbie हूँ, आपकी निजी सहायक। आज मैं आपकी कैसे मदद कर सकती हूँ?",
+        "bn": "হ্যালো! আমি Abbie, আপনার ব্যক্তিগত সহকারী। আজ আমি আপনাকে কীভাবে সাহায্য করতে পারি?",
+        "ar": "مرحبًا! أنا Abbie، مساعدتك الشخصية. كيف يمكنني مساعدتك اليوم؟",
+        "ur": "السلام علیکم! میں Abbie ہوں، آپ کی ذاتی اسسٹنٹ۔ آج میں آپ کی کیسے مدد کر سکتی ہوں؟",
+        "ru": "Привет! Я Abbie, ваш личный помощник. Чем я могу помочь вам сегодня?",
+        "tr": "Merhaba! Ben Abbie, kişisel asistanınım. Bugün sana nasıl yardımcı olabilirim?",
+        "zh": "你好！我是 Abbie，你的私人助理。今天我能帮你做些什么？",
+        "ja": "こんにちは！私はあなたのパーソナルアシスタントのAbbieです。今日はどのようにお手伝いできますか？",
+        "ko": "안녕하세요! 저는 당신의 개인 비서 Abbie입니다. 오늘 무엇을 도와드릴까요?",
+    },
+    "thanks": {
+        "en": "You're welcome! Let me know if there is anything else I can help you with.",
+        "es": "¡De nada! Avísame si hay algo más en lo que pueda ayudarte.",
+        "fr": "Avec plaisir ! Dites-moi si je peux vous aider pour autre chose.",
+        "de": "Gern geschehen! Sag mir Bescheid, wenn ich dir noch bei etwas helfen kann.",
+        "bn": "আপনাকে স্বাগতম! আর কিছু সাহায্য লাগলে আমাকে জানাবেন।",
+    },
+    "goodbye": {
+        "en": "Goodbye! Have a wonderful day, and come back anytime you need help.",
+        "es": "¡Adiós! Que tengas un día maravilloso. Vuelve cuando necesites ayuda.",
+        "fr": "Au revoir ! Passez une excellente journée, et revenez quand vous voulez.",
+        "de": "Tschüss! Hab einen schönen Tag und melde dich jederzeit wieder.",
+    },
+}
+
+
+def _normalize(text: str) -> str:
+    # Lowercase, drop accents, punctuation and emoji, collapse whitespace
+    text = unicodedata.normalize("NFKD", text.lower())
+    kept = []
+    for ch in text:
+        category = unicodedata.category(ch)
+        if category == "Mn":
+            continue
+        kept.append(" " if category[0] in ("P", "S") else ch)
+    return unicodedata.normalize("NFC", " ".join("".join(kept).split()))
+
+
+# Phrases and replies are in a known language, so language identification (which
+# picks the TTS voice for a spoken reply) never has to guess on these short texts.
+# Registered as written: language identification normalizes them its own way,
+# which keeps accents and combining marks (so spellings with accents are listed too).
+register_known((phrase, lang) for phrase, (_, lang) in _PHRASES.items())
+register_known((reply, lang) for replies in _REPLIES.values() for lang, reply in replies.items())
+
+# Phrases are stored in the same normalized form the input is reduced to
+_PHRASES = {_normalize(phrase): value for phrase, value in _PHRASES.items()}
+
+
+class FastPathResponder:
+    """
+    Answers trivial messages (bare greetings, thanks, goodbyes) from local
+    templates, in the language of the message, without calling the LLM.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.bypassed = 0
+        self.by_intent: Counter = Counter()
+
+    def classify(self, text: str) -> Optional[Tuple[str, str]]:
+        """Return (intent, language) if `text` is a canned intent, else None."""
+        normalized = _normalize(text)
+        if not normalized or len(normalized) > 40:
+            return None
+        match = _PHRASES.get(normalized)
+        if match:
+            return match
+
+        words = normalized.split()
+        while len(words) > 1 and words[-1] in _FILLERS:
+            words.pop()
+        return _PHRASES.get(" ".join(words))
+
+    def respond(self, text: str) -> Optional[str]:
+        """Return a canned reply for `text`, or None when the LLM is needed."""
+        if not self.enabled:
+            return None
+        match = self.classify(text)
+        if match is None:
+            CACHE_LOOKUPS.inc(cache="chat_fast_path", result="miss")
+            return None
+        intent, lang = match
+        replies = _REPLIES[intent]
+        self.bypassed += 1
+        CACHE_LOOKUPS.inc(cache="chat_fast_path", result="hit")
+        self.by_intent[intent] += 1
+        return replies.get(lang, replies["en"])
+
+    def stats(self) -> Dict[str, object]:
+        return {"enabled": self.enabled, "bypassed_llm_calls": self.bypassed, "by_intent": dict(self.by_intent)}
+
+
+fast_path_responder = FastPathResponder(enabled=settings.CHAT_FAST_PATH_ENABLED)
@@ -1,17 +1,24 @@
-from openai import OpenAI
 from fastapi import HTTPException
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Any, AsyncIterator
 from app.config import settings
+from app.openai_client import get_openai_client
+from app.chat.session_store import session_store
+from app.token_budget import fit_history
+from app.chat.fast_path import fast_path_responder
+from app.single_flight import make_key, single_flight_group
+from app.metrics import record_usage, track_upstream
+from app.resilience import chat_policy, upstream_http_error
+from app.services import lazy_service
+from app.admission import primed
 
 
 class ChatLLMService:
     def __init__(self):
-        if not settings.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY is required")
-        self.client = OpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            base_url=settings.OPENAI_API_BASE
-        )
+        self.client = get_openai_client()
+        self.sessions = session_store
+        self.fast_path = fast_path_responder
+        # Identical prompts in flight at the same time share one upstream call
+        self.inflight = single_flight_group("chat_completion")
         
         # Move AGE_BASED_SYSTEM_PROMPT here from config
         self.AGE_BASED_SYSTEM_PROMPT = """You are an AI-powered assistant that responds based on the user's age and the context of their query. When you give answer act like friendly assistant. Also you are a multilingual assistant. Always detect the language of the user's query and respond in the same language clearly and concisely. The system must ensure appropriate content filtering, as outlined below. For every input, you must:
@@ -76,11 +83,70 @@ class ChatLLMService:
         Provide motivational or general advice for younger users, but avoid complex or adult-oriented content.
         """
 
-    def generate_response(
+    def build_messages(
         self,
         text: str,
         user_age: int,
         conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Build the OpenAI message list: system prompt, prior turns, then the current query.
+
+        The system prompt always comes first and unchanged so the provider's prompt
+        cache can reuse it. History is limited to MAX_HISTORY_MESSAGES turns and
+        CHAT_HISTORY_TOKEN_BUDGET tokens; older turns become a one-line summary.
+        """
+        # Start with system prompt
+        messages = [{"role": "system", "content": self.AGE_BASED_SYSTEM_PROMPT}]
+
+        # Add conversation history if provided
+        if conversation_history:
+            turns = [
+                msg for msg in conversation_history
+                if "user_query" in msg and "ai_response" in msg
+            ][-settings.MAX_HISTORY_MESSAGES:]
+            turns, summary = fit_history(
+                turns,
+                budget=settings.CHAT_HISTORY_TOKEN_BUDGET,
+                summary_budget=settings.CHAT_HISTORY_SUMMARY_TOKENS
+            )
+            if summary:
+                messages.append({"role": "system", "content": summary})
+
+            # Convert conversation history to OpenAI message format
+            for msg in turns:
+                messages.append({"role": "user", "content": msg["user_query"]})
+                messages.append({"role": "assistant", "content": msg["ai_response"]})
+
+        # Add current user message with age context
+        user_message = f"User Age: {user_age}\nQuery: {text}"
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def resolve_history(
+        self,
+        user_id: Optional[str],
+        conversation_history: Optional[List[Dict[str, str]]]
+    ) -> Optional[List[Dict[str, str]]]:
+        """Use the client-supplied history when given, else the server-side session for user_id."""
+        if conversation_history is None and user_id:
+            return self.sessions.get_history(user_id)
+        return conversation_history
+
+    def remember(self, user_id: Optional[str], text: str, answer: str):
+        """Append a completed exchange to the user's session."""
+        if user_id and answer:
+            self.sessions.append(user_id, text, answer)
+
+    async def _session_io(self, fn, *args):
+        return await self.sessions.run_io(fn, *args)
+
+    async def generate_response(
+        self,
+        text: str,
+        user_age: int,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        user_id: Optional[str] = None
     ) -> str:
         """
         Generate a chat response using AGE_BASED_SYSTEM_PROMPT with conversation history.
@@ -90,39 +156,118 @@ class ChatLLMService:
             - user_age: int
             - conversation_history: optional list of conversation messages
               Format: [{"user_query": "...", "ai_response": "..."}, ...]
+            - user_id: optional; when set and no history is sent, the server-side
+              session is used and the new exchange is appended to it
 
         Output:
             - str (chat answer)
         """
 
+        # Greetings and other canned intents are answered locally
+        canned = self.fast_path.respond(text)
+        if canned:
+            await self._session_io(self.remember, user_id, text, canned)
+            return canned
+
         try:
-            # Start with system prompt
-            messages = [{"role": "system", "content": self.AGE_BASED_SYSTEM_PROMPT}]
-
-            # Add conversation history if provided
-            if conversation_history:
-                # Convert conversation history to OpenAI message format
-                for msg in conversation_history:
-                    if "user_query" in msg and "ai_response" in msg:
-                        messages.append({"role": "user", "content": msg["user_query"]})
-                        messages.append({"role": "assistant", "content": msg["ai_response"]})
-
-            # Add current user message with age context
-            user_message = f"User Age: {user_age}\nQuery: {text}"
-            messages.append({"role": "user", "content": user_message})
-
-            response = self.client.chat.completions.create(
+            history = await self._session_io(self.resolve_history, user_id, conversation_history)
+            messages = self.build_messages(text, user_age, history)
+
+            request = dict(
                 model=settings.CHAT_MODEL,
                 messages=messages,
                 max_tokens=settings.MAX_TOKENS,
                 temperature=settings.TEMPERATURE,
             )
+            response = await self.inflight.do(make_key(request), lambda: self._complete(request))
+
+            answer = response.choices[0].message.content
+            await self._session_io(self.remember, user_id, text, answer)
+            return answer
+
+        except Exception as e:
+            raise upstream_http_error(e, "Error generating chat response") or HTTPException(
+                status_code=500, detail=f"Error generating chat response: {str(e)}"
+            )
+
+    async def stream_response(
+        self,
+        text: str,
+        user_age: int,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        user_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a chat response token by token.
+
+        The upstream request is opened before returning, so errors surface as an
+        HTTPException instead of a broken stream. The returned iterator yields
+        {"type": "token", "delta": "..."} events and finally
+        {"type": "done", "answer": "...", "usage": {...}}.
+        """
+        canned = self.fast_path.respond(text)
+        if canned:
+            return self._canned_stream(user_id, text, canned)
 
-            return response.choices[0].message.content
+        try:
+            history = await self._session_io(self.resolve_history, user_id, conversation_history)
+            messages = self.build_messages(text, user_age, history)
 
+            with track_upstream("chat_stream"):
+                stream = await chat_policy.call(
+                    lambda: self.client.chat.completions.create(
+                        model=settings.CHAT_MODEL,
+                        messages=messages,
+                        max_tokens=settings.MAX_TOKENS,
+                        temperature=settings.TEMPERATURE,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    ),
+                    hedge=False
+                )
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error generating chat response: {str(e)}")
+            raise upstream_http_error(e, "Error generating chat response") or HTTPException(
+                status_code=500, detail=f"Error generating chat response: {str(e)}"
+            )
+
+        return await primed(self._relay_stream(stream, user_id, text))
+
+    async def _complete(self, request: Dict[str, Any]):
+        # Runs once per coalesced group, so usage is counted once per upstream call
+        with track_upstream("chat"):
+            response = await chat_policy.call(lambda: self.client.chat.completions.create(**request))
+        record_usage("chat", response.usage)
+        return response
+
+    async def _canned_stream(self, user_id: Optional[str], text: str, answer: str) -> AsyncIterator[Dict[str, Any]]:
+        await self._session_io(self.remember, user_id, text, answer)
+        yield {"type": "token", "delta": answer}
+        yield {"type": "done", "answer": answer, "usage": None}
+
+    async def _relay_stream(self, stream, user_id: Optional[str], text: str) -> AsyncIterator[Dict[str, Any]]:
+        parts: List[str] = []
+        usage = None
+        try:
+            # Primed (see app.admission.primed), so closing the relay unread still closes the stream
+            yield None
+            async for chunk in stream:
+                # The final chunk carries usage and no choices
+                if chunk.usage is not None:
+                    usage = chunk.usage.model_dump()
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield {"type": "token", "delta": delta}
+        finally:
+            await stream.close()
+
+        answer = "".join(parts)
+        record_usage("chat_stream", usage)
+        await self._session_io(self.remember, user_id, text, answer)
+        yield {"type": "done", "answer": answer, "usage": usage}
 
 
-# Singleton
-chat_llm_service = ChatLLMService()
\ No newline at end of file
+# Singleton, built on first use (see app/services.py)
+chat_llm_service = lazy_service("chat_llm", ChatLLMService)
\ No newline at end of file
@@ -0,0 +1,135 @@
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.config import settings
+from app.executors import run_in_executor
+
+
+class _Session:
+    __slots__ = ("turns", "last_seen")
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Dict[str, str]] = deque(maxlen=max_turns)
+        self.last_seen = time.time()
+
+
+class SessionStore:
+    """
+    Per-user conversation memory for the chat endpoints.
+
+    Keeps each user's most recent turns ({"user_query", "ai_response"}) in an
+    in-process LRU with a TTL. When `db_path` is set, turns are also written to a
+    local SQLite file so history survives restarts. Reads are served from the
+    in-process copy once loaded, so history is not shared between workers.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float, max_turns: int, db_path: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS chat_turns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                user_query TEXT NOT NULL,
+                ai_response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_chat_turns_user ON chat_turns (user_id, id)")
+
+    @property
+    def persistent(self) -> bool:
+        """True when turns are also stored in SQLite (reads and writes touch disk)."""
+        return self._db is not None
+
+    async def run_io(self, fn: Callable[..., Any], *args) -> Any:
+        """Call a store method; SQLite-backed sessions do disk I/O, so it runs on the LLM thread pool."""
+        if self.persistent:
+            return await run_in_executor("llm", fn, *args)
+        return fn(*args)
+
+    def _expired(self, session: _Session, now: float) -> bool:
+        return now - session.last_seen > self.ttl_seconds
+
+    def _load(self, user_id: str, now: float) -> _Session:
+        session = _Session(self.max_turns)
+        if self._db is not None:
+            rows = self._db.execute(
+                "SELECT user_query, ai_response, created_at FROM chat_turns "
+                "WHERE user_id = ? AND created_at >= ? ORDER BY id DESC LIMIT ?",
+                (user_id, now - self.ttl_seconds, self.max_turns),
+            ).fetchall()
+            for user_query, ai_response, _ in reversed(rows):
+                session.turns.append({"user_query": user_query, "ai_response": ai_response})
+            if rows:
+                session.last_seen = rows[0][2]
+        return session
+
+    def _session(self, user_id: str, now: float) -> _Session:
+        session = self._sessions.get(user_id)
+        if session is None or self._expired(session, now):
+            session = self._load(user_id, now)
+            self._sessions[user_id] = session
+        self._sessions.move_to_end(user_id)
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def get_history(self, user_id: str) -> List[Dict[str, str]]:
+        """Return the user's recent turns, oldest first."""
+        now = time.time()
+        with self._lock:
+            session = self._session(user_id, now)
+            if self._expired(session, now):
+                session.turns.clear()
+            return list(session.turns)
+
+    def append(self, user_id: str, user_query: str, ai_response: str):
+        """Record one exchange, keeping only the last `max_turns` turns."""
+        now = time.time()
+        with self._lock:
+            session = self._session(user_id, now)
+            if self._expired(session, now):
+                session.turns.clear()
+            session.turns.append({"user_query": user_query, "ai_response": ai_response})
+            session.last_seen = now
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO chat_turns (user_id, user_query, ai_response, created_at) VALUES (?, ?, ?, ?)",
+                    (user_id, user_query, ai_response, now),
+                )
+                self._db.execute(
+                    "DELETE FROM chat_turns WHERE user_id = ? AND id NOT IN "
+                    "(SELECT id FROM chat_turns WHERE user_id = ? ORDER BY id DESC LIMIT ?)",
+                    (user_id, user_id, self.max_turns),
+                )
+
+    def clear(self, user_id: str):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM chat_turns WHERE user_id = ?", (user_id,))
+
+
+session_store = SessionStore(
+    max_sessions=settings.CHAT_SESSION_MAX_USERS,
+    ttl_seconds=settings.CHAT_SESSION_TTL_SECONDS,
+    max_turns=settings.MAX_HISTORY_MESSAGES,
+    db_path=settings.CHAT_SESSION_DB_PATH or None,
+)
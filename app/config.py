@@ -1,33 +1,87 @@
 import os
+import logging
 from typing import Dict, Any
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class Settings:
-    def __init__(self):
-        # Ensure required directories exist
+    def ensure_directories(self):
+        """Create the working directories. Called at startup, not at import."""
         os.makedirs(self.TEMP_DIR, exist_ok=True)
         os.makedirs(self.AUDIO_RESPONSE_PATH, exist_ok=True)
-        print(f"[CONFIG] Created/verified directories: {self.TEMP_DIR}, {self.AUDIO_RESPONSE_PATH}")
+        logger.info("Created/verified directories", extra={"temp_dir": self.TEMP_DIR, "audio_dir": self.AUDIO_RESPONSE_PATH})
+        if not os.access(self.AUDIO_RESPONSE_PATH, os.W_OK):
+            logger.error("Audio directory is not writable", extra={"audio_dir": self.AUDIO_RESPONSE_PATH})
 
     # ── App Configuration 
     APP_NAME: str = "Voice Assistant ChatBot API"
     APP_DESCRIPTION: str = "A voice assistant with To-do, Job finding, and General chat capabilities"
     APP_VERSION: str = "1.0.0"
+
+    # ── Serving: uvicorn worker processes (uvicorn reads WEB_CONCURRENCY itself) and
+    # whether services are built in the background right after startup instead of
+    # on the first request that needs them. Chat sessions and the micro-goal task
+    # index are per worker, so keep one worker unless clients send their own history.
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    SERVICE_WARMUP_ON_STARTUP: bool = True
+
+    # ── Logging (app/logging_setup.py): written by a background thread from a bounded queue
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")  # DEBUG also logs TTS file path checks
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped, never waited for
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))  # Share of high-volume events kept (access log, ...)
+    LOG_SLOW_REQUEST_MS: float = 2000.0  # Slower requests are always logged
     
     # ── OpenAI Configuration 
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    OPENAI_API_BASE: str = "https://api.openai.com/v1"  # Base URL without any path
+    OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")  # Point at bench/fake_openai.py for load tests
     CHAT_MODEL: str = "gpt-4.1-mini"
     WHISPER_MODEL: str = "whisper-1"
     WHISPER_RESPONSE_FORMAT: str = "text"  # Can be 'text', 'json', 'srt', 'verbose_json', or 'vtt'
-    
+
+    # ── Shared OpenAI HTTP client (one pool for chat, micro goals and speech)
+    OPENAI_TIMEOUT: float = 60.0
+    OPENAI_HTTP2: bool = True
+    OPENAI_MAX_CONNECTIONS: int = 500
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 100
+    OPENAI_KEEPALIVE_EXPIRY: float = 30.0
+
     # ── Model Configuration 
     MAX_TOKENS: int = 1000
     TEMPERATURE: float = 0.7
     MAX_HISTORY_MESSAGES: int = 5
+
+    CHAT_FAST_PATH_ENABLED: bool = True  # Answer bare greetings/thanks locally without the LLM
+
+    # ── Prompt token budgets (estimated locally, see app/token_budget.py)
+    CHAT_HISTORY_TOKEN_BUDGET: int = 2000
+    CHAT_HISTORY_SUMMARY_TOKENS: int = 120
+    MICRO_GOAL_TASKS_TOKEN_BUDGET: int = 600
+
+    # ── Micro goal generation
+    MICRO_GOAL_PLAN_SIZE: int = 5
+    MICRO_GOAL_MAX_TOKENS: int = 700
+    MICRO_GOAL_TEMPERATURE: float = 0.7
+    MICRO_GOAL_REPAIR_ATTEMPTS: int = 2  # Rounds of regenerating only the invalid entries
+    MICRO_GOAL_SIMILARITY_THRESHOLD: float = 0.6  # Trigram Jaccard above which a task counts as a repeat
+    MICRO_GOAL_INDEX_MAX_TASKS_PER_USER: int = 500
+    MICRO_GOAL_INDEX_MAX_USERS: int = 10000
+
+    # Batch generation
+    MICRO_GOAL_BATCH_CONCURRENCY: int = 16  # Concurrent upstream calls per batch request (each takes an admission slot)
+    MICRO_GOAL_BATCH_MAX_ITEMS: int = 1000  # Streamed (NDJSON) batches
+    # Non-streamed batches answer only when every item is done; keep them well inside
+    # nginx's 60 s proxy_read_timeout (a few rounds of MICRO_GOAL_BATCH_CONCURRENCY)
+    MICRO_GOAL_BATCH_SYNC_MAX_ITEMS: int = 32
+
+    # ── Chat sessions (server-side conversation history keyed by user_id)
+    CHAT_SESSION_MAX_USERS: int = 10000
+    CHAT_SESSION_TTL_SECONDS: int = 6 * 3600
+    CHAT_SESSION_DB_PATH: str = os.getenv("CHAT_SESSION_DB_PATH", "")  # Empty = in-memory only
     
     # ── Audio Configuration 
 
@@ -35,10 +89,105 @@ class Settings:
     
     TEMP_DIR: str = "/app/temp"
     AUDIO_RESPONSE_PATH: str = "/app/audio"  # Fixed path that matches Docker volume mount
+
+    # Audio store: generated files expire after a TTL and total disk use is capped
+    AUDIO_FILE_TTL_SECONDS: int = 24 * 3600
+    AUDIO_STORE_MAX_BYTES: int = 1024 * 1024 * 1024  # 1 GB
+    AUDIO_STORE_MAX_FILES: int = 10000
+    AUDIO_MAINTENANCE_INTERVAL_SECONDS: int = 300
+
+    # Audio delivery: file names hash the synthesis request. A name re-synthesized after
+    # eviction gets new bytes (and a new ETag), but any version is a valid rendering,
+    # so clients may keep the one they have
+    AUDIO_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+    # When set (e.g. "/_audio/"), nginx sends the file bytes via X-Accel-Redirect
+    AUDIO_ACCEL_REDIRECT_PREFIX: str = os.getenv("AUDIO_ACCEL_REDIRECT_PREFIX", "")
+
+    # Text-to-speech
+    TTS_MODEL: str = "gpt-4o-mini-tts"
+    TTS_RESPONSE_FORMAT: str = "mp3"
+    TTS_STREAM_CHUNK_SIZE: int = 4096
+    TTS_STREAM_TEE_TO_CACHE: bool = True  # Save streamed audio into the TTS cache as it is sent
+    TTS_CHUNK_MAX_CHARS: int = 600  # Longer texts are split at sentences and synthesized in parallel
+    TTS_CHUNK_CONCURRENCY: int = 4
+    VOICE_TURN_TTS_CONCURRENCY: int = 4  # Sentences synthesized in parallel per voice turn
+
+    # Language identification (app/language.py), which picks TTS voices and instructions
+    LANGUAGE_ID_CACHE_SIZE: int = 10000  # Memoized texts
+    LANGUAGE_ID_SEED: int = 0  # langdetect is randomized; a fixed seed makes it deterministic
+    LANGUAGE_ID_MAX_CHARS: int = 400  # Only the start of longer texts is examined
+    LANGUAGE_ID_MIN_LETTERS: int = 20  # Shorter texts get a script-based answer or "und", not a guess
+    LANGUAGE_ID_MIN_CONFIDENCE: float = 0.8
+    # Sent to TTS models that take instructions (not tts-1); empty to disable
+    TTS_LANGUAGE_INSTRUCTIONS: str = "Speak in {language}, with natural native pronunciation."
+    # Per-language voice overrides, e.g. {"ar": {"male": "onyx", "female": "shimmer"}}
+    TTS_LANGUAGE_VOICES: Dict[str, Dict[str, str]] = {}
+
     # Whisper configuration
+    MAX_AUDIO_UPLOAD_BYTES: int = 25 * 1024 * 1024  # Whisper rejects files above 25 MB: the cap per request sent
+    # Decodable uploads (WAV) are downsampled and segmented locally, so each request to
+    # Whisper stays far below MAX_AUDIO_UPLOAD_BYTES and the raw upload may be larger
+    # (100 MB is ~9 minutes of 48 kHz stereo). Keep nginx's client_max_body_size above it.
+    MAX_SEGMENTABLE_UPLOAD_BYTES: int = 100 * 1024 * 1024
     WHISPER_LANGUAGE_DETECT: bool = True  # Enable language detection
+
+    # Local preprocessing before Whisper (needs numpy): decode, mix to mono,
+    # resample and trim leading/trailing silence with an energy VAD
+    AUDIO_PREPROCESS_ENABLED: bool = True
+    AUDIO_TARGET_SAMPLE_RATE: int = 16000  # Whisper works at 16 kHz internally
+    AUDIO_VAD_FRAME_MS: int = 30
+    AUDIO_VAD_THRESHOLD_DB: float = -50.0  # Frames quieter than this are never speech
+    AUDIO_VAD_NOISE_MARGIN_DB: float = 10.0  # Speech must be this far above the noise floor
+    AUDIO_VAD_PADDING_MS: int = 250  # Audio kept before the first and after the last speech frame
+    # Longest decodable recording accepted (413 beyond). Decoded audio is held as 16 kHz
+    # float32, ~3.8 MB per minute, for each of the STT_EXECUTOR_WORKERS in flight
+    STT_MAX_AUDIO_SECONDS: float = 20 * 60
+
+    # Long decodable recordings are cut at the quietest point near every
+    # STT_SEGMENT_TARGET_SECONDS (never past MAX) and the segments transcribed concurrently
+    STT_SEGMENT_MIN_SECONDS: float = 60.0  # Shorter recordings are sent in one request
+    STT_SEGMENT_TARGET_SECONDS: float = 30.0
+    STT_SEGMENT_MAX_SECONDS: float = 45.0
+    STT_SEGMENT_CONCURRENCY: int = 4  # Whisper calls in flight per transcription
     WHISPER_TASK: str = "transcribe"  # Can be 'transcribe' or 'translate'
     
+    # ── Admission control: concurrent requests per endpoint group, plus how many may
+    # wait for a slot. A full queue answers 429, a wait over the timeout 503,
+    # both with Retry-After.
+    CHAT_MAX_CONCURRENT: int = 64
+    CHAT_MAX_QUEUE: int = 128
+    MICRO_GOAL_MAX_CONCURRENT: int = 32
+    MICRO_GOAL_MAX_QUEUE: int = 64
+    STT_MAX_CONCURRENT: int = 16
+    STT_MAX_QUEUE: int = 32
+    TTS_MAX_CONCURRENT: int = 32
+    TTS_MAX_QUEUE: int = 64
+    VOICE_TURN_MAX_CONCURRENT: int = 16
+    VOICE_TURN_MAX_QUEUE: int = 32
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    ADMISSION_RETRY_AFTER_SECONDS: int = 2
+
+    # ── Upstream resilience (app/resilience.py): per-attempt timeouts, retries with
+    # jittered backoff, hedging of idempotent calls and circuit breaking
+    CHAT_TIMEOUT_SECONDS: float = 30.0  # For streams: until the response starts
+    MICRO_GOAL_TIMEOUT_SECONDS: float = 45.0
+    STT_TIMEOUT_SECONDS: float = 60.0
+    TTS_TIMEOUT_SECONDS: float = 60.0
+    UPSTREAM_MAX_ATTEMPTS: int = 3
+    UPSTREAM_RETRY_BASE_DELAY_SECONDS: float = 0.25
+    UPSTREAM_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    UPSTREAM_HEDGE_ENABLED: bool = True
+    UPSTREAM_HEDGE_PERCENTILE: float = 95.0  # Send a duplicate once an attempt is slower than this
+    UPSTREAM_HEDGE_MIN_SAMPLES: int = 20
+    UPSTREAM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before failing fast
+    UPSTREAM_CIRCUIT_RESET_SECONDS: float = 30.0
+
+    # Thread pools for blocking work, one per workload
+    TTS_EXECUTOR_WORKERS: int = 4
+    STT_EXECUTOR_WORKERS: int = 4
+    LLM_EXECUTOR_WORKERS: int = 4
+    LANGUAGE_EXECUTOR_WORKERS: int = 2
+
     # Validation
     def __post_init__(self):
         if not self.OPENAI_API_KEY:
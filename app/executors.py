@@ -0,0 +1,43 @@
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from app.config import settings
+
+
+T = TypeVar("T")
+
+# Thread pools per workload, so blocking file or CPU work for one kind of request
+# cannot take every thread from the others (or from the loop's default executor)
+EXECUTOR_WORKERS = {
+    "tts": settings.TTS_EXECUTOR_WORKERS,
+    "stt": settings.STT_EXECUTOR_WORKERS,
+    "llm": settings.LLM_EXECUTOR_WORKERS,
+    "language": settings.LANGUAGE_EXECUTOR_WORKERS,
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    executor = _executors.get(name)
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS[name], thread_name_prefix=f"{name}-worker")
+        _executors[name] = executor
+    return executor
+
+
+async def run_in_executor(name: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking `fn(*args, **kwargs)` on the named workload's thread pool."""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (the request id for logging) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(name), functools.partial(context.run, fn, *args, **kwargs))
+
+
+def shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
@@ -0,0 +1,262 @@
+import logging
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.executors import run_in_executor
+from app.metrics import CACHE_LOOKUPS
+from app.services import lazy_service
+
+
+logger = logging.getLogger(__name__)
+
+# BCP 47 "undetermined": too short or too mixed to tell. Callers fall back to defaults.
+UNDETERMINED = "und"
+
+# Code point ranges of scripts
+_SCRIPTS: List[Tuple[int, int, str]] = [
+    (0x0370, 0x03FF, "greek"),
+    (0x0400, 0x04FF, "cyrillic"),
+    (0x0530, 0x058F, "armenian"),
+    (0x0590, 0x05FF, "hebrew"),
+    (0x0600, 0x06FF, "arabic"),
+    (0x0750, 0x077F, "arabic"),
+    (0x0900, 0x097F, "devanagari"),
+    (0x0980, 0x09FF, "bengali"),
+    (0x0A00, 0x0A7F, "gurmukhi"),
+    (0x0A80, 0x0AFF, "gujarati"),
+    (0x0B80, 0x0BFF, "tamil"),
+    (0x0C00, 0x0C7F, "telugu"),
+    (0x0C80, 0x0CFF, "kannada"),
+    (0x0D00, 0x0D7F, "malayalam"),
+    (0x0E00, 0x0E7F, "thai"),
+    (0x10A0, 0x10FF, "georgian"),
+    (0x1100, 0x11FF, "hangul"),
+    (0x3040, 0x309F, "kana"),
+    (0x30A0, 0x30FF, "kana"),
+    (0x3130, 0x318F, "hangul"),
+    (0x4E00, 0x9FFF, "han"),
+    (0xAC00, 0xD7AF, "hangul"),
+]
+
+# Scripts used by a single language (of those we serve), which identify it
+# without statistical detection. Cyrillic (ru/uk/bg/...), Arabic (ar/fa/ur) and
+# Devanagari (hi/mr/ne) are shared, so texts in them are left to langdetect, and
+# short ones are "und": defaulting to e.g. Arabic would give Persian and Urdu
+# replies the wrong TTS instructions.
+_SCRIPT_LANGUAGES: Dict[str, str] = {
+    "greek": "el",
+    "armenian": "hy",
+    "hebrew": "he",
+    "bengali": "bn",
+    "gurmukhi": "pa",
+    "gujarati": "gu",
+    "tamil": "ta",
+    "telugu": "te",
+    "kannada": "kn",
+    "malayalam": "ml",
+    "thai": "th",
+    "georgian": "ka",
+    "hangul": "ko",
+    "kana": "ja",
+    "han": "zh",  # Unless kana also appears, which makes it Japanese
+}
+
+# Names used in TTS instructions
+LANGUAGE_NAMES: Dict[str, str] = {
+    "af": "Afrikaans", "ar": "Arabic", "bg": "Bulgarian", "bn": "Bengali", "ca": "Catalan",
+    "cs": "Czech", "cy": "Welsh", "da": "Danish", "de": "German", "el": "Greek", "en": "English",
+    "es": "Spanish", "et": "Estonian", "fa": "Persian", "fi": "Finnish", "fr": "French",
+    "gu": "Gujarati", "he": "Hebrew", "hi": "Hindi", "hr": "Croatian", "hu": "Hungarian",
+    "hy": "Armenian", "id": "Indonesian", "it": "Italian", "ja": "Japanese", "ka": "Georgian",
+    "kn": "Kannada", "ko": "Korean", "lt": "Lithuanian", "lv": "Latvian", "mk": "Macedonian",
+    "ml": "Malayalam", "mr": "Marathi", "ne": "Nepali", "nl": "Dutch", "no": "Norwegian",
+    "pa": "Punjabi", "pl": "Polish", "pt": "Portuguese", "ro": "Romanian", "ru": "Russian",
+    "sk": "Slovak", "sl": "Slovenian", "so": "Somali", "sq": "Albanian", "sv": "Swedish",
+    "sw": "Swahili", "ta": "Tamil", "te": "Telugu", "th": "Thai", "tl": "Tagalog", "tr": "Turkish",
+    "uk": "Ukrainian", "ur": "Urdu", "vi": "Vietnamese", "zh": "Chinese",
+}
+
+# Texts whose language is known outright (e.g. the chat fast path's phrases and
+# replies), by normalized text. Checked before anything else, never evicted.
+_KNOWN: Dict[str, str] = {}
+
+
+def normalize(text: str) -> str:
+    """Casefold, drop punctuation and symbols, collapse whitespace, and keep only the examined prefix."""
+    text = unicodedata.normalize("NFC", text).casefold()
+    kept = [" " if unicodedata.category(ch)[0] in ("P", "S", "C") else ch for ch in text]
+    return " ".join("".join(kept).split())[: settings.LANGUAGE_ID_MAX_CHARS]
+
+
+def register_known(pairs: Iterable[Tuple[str, str]]):
+    """Record (text, language) pairs whose language is certain."""
+    for text, language in pairs:
+        key = normalize(text)
+        if key:
+            _KNOWN[key] = language
+
+
+def _script_of(ch: str) -> Optional[str]:
+    code = ord(ch)
+    if code < 0x0370:
+        return "latin" if ch.isalpha() else None
+    for start, end, script in _SCRIPTS:
+        if start <= code <= end:
+            return script
+    return None
+
+
+def script_language(text: str) -> Tuple[Optional[str], int]:
+    """
+    Identify from the writing system alone: (language or None, letter count).
+    Latin and the shared scripts say nothing on their own, so they yield None.
+    """
+    scripts: Counter = Counter()
+    letters = 0
+    for ch in text:
+        if ch.isalpha():
+            letters += 1
+            script = _script_of(ch)
+            if script:
+                scripts[script] += 1
+    if not scripts:
+        return None, letters
+    if scripts["kana"]:
+        return "ja", letters
+    script, _ = scripts.most_common(1)[0]
+    return _SCRIPT_LANGUAGES.get(script), letters
+
+
+class LanguageIdentifier:
+    """
+    Cached, deterministic language identification for short user and model texts.
+
+    In order: known texts, the memo (LRU on normalized text), the script of the
+    text (exact for e.g. Korean or Thai), and only then langdetect, seeded so
+    the same text always gets the same answer. Texts too short for statistical
+    detection, or detected without confidence, get "und" instead of a guess.
+    Building the service loads langdetect's profiles (~0.5 s), which the
+    lifespan warm-up does in the background.
+    """
+
+    def __init__(self):
+        self.max_entries = settings.LANGUAGE_ID_CACHE_SIZE
+        self._memo: "OrderedDict[str, str]" = OrderedDict()
+        # Detection runs on executor threads as well as the loop
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._detect_langs = None
+        try:
+            from langdetect import DetectorFactory, detect_langs
+            from langdetect.detector_factory import init_factory
+            DetectorFactory.seed = settings.LANGUAGE_ID_SEED
+            init_factory()
+            self._detect_langs = detect_langs
+        except ImportError:
+            logger.warning("langdetect is not installed; only script-based language identification is available")
+
+    def _cached(self, key: str) -> Optional[str]:
+        known = _KNOWN.get(key)
+        if known is not None:
+            return known
+        with self._lock:
+            language = self._memo.get(key)
+            if language is not None:
+                self._memo.move_to_end(key)
+        return language
+
+    def _remember(self, key: str, language: str):
+        with self._lock:
+            self._memo[key] = language
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    def _count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        CACHE_LOOKUPS.inc(cache="language", result="hit" if hit else "miss")
+
+    def _fast_path(self, key: str) -> Optional[str]:
+        """Answer from the script or the text's shortness; None when statistical detection is needed."""
+        language, letters = script_language(key)
+        if language is not None:
+            return language
+        if letters < settings.LANGUAGE_ID_MIN_LETTERS or self._detect_langs is None:
+            return UNDETERMINED
+        return None
+
+    def _identify(self, key: str) -> str:
+        fast = self._fast_path(key)
+        if fast is not None:
+            return fast
+        try:
+            best = self._detect_langs(key)[0]
+        except Exception:
+            return UNDETERMINED
+        if best.prob < settings.LANGUAGE_ID_MIN_CONFIDENCE:
+            return UNDETERMINED
+        # zh-cn / zh-tw -> zh
+        return best.lang.split("-")[0]
+
+    def detect(self, text: str) -> str:
+        """Return the ISO 639-1 code of `text`'s language, or "und"."""
+        key = normalize(text)
+        if not key:
+            return UNDETERMINED
+        language = self._cached(key)
+        self._count(language is not None)
+        if language is None:
+            language = self._identify(key)
+            self._remember(key, language)
+        return language
+
+    def detect_many(self, texts: List[str]) -> List[str]:
+        """Batch form of `detect`: each distinct normalized text is identified once."""
+        results: Dict[str, str] = {"": UNDETERMINED}
+        keys = [normalize(text) for text in texts]
+        for key in keys:
+            if key not in results:
+                results[key] = self.detect(key)
+        return [results[key] for key in keys]
+
+    async def detect_async(self, text: str) -> str:
+        """`detect` without blocking the loop: cache hits and the fast path answer inline."""
+        key = normalize(text)
+        if not key:
+            return UNDETERMINED
+        language = self._cached(key)
+        if language is not None:
+            self._count(True)
+            return language
+        language = self._fast_path(key)
+        if language is not None:
+            # Counted and memoized like `detect` does
+            self._count(False)
+            self._remember(key, language)
+            return language
+        # `detect` counts the lookup
+        return await run_in_executor("language", self.detect, key)
+
+    async def detect_many_async(self, texts: List[str]) -> List[str]:
+        return await run_in_executor("language", self.detect_many, texts)
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memo),
+            "known_texts": len(_KNOWN),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Built on first use, or by the lifespan warm-up (see app/services.py)
+language_identifier = lazy_service("language", LanguageIdentifier)
@@ -0,0 +1,207 @@
+import sys
+import json
+import time
+import uuid
+import queue
+import random
+import logging
+import traceback
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from app.config import settings
+from app.metrics import counter
+
+
+# Everything in the app logs under "app.*" (logging.getLogger(__name__)); uvicorn's
+# own loggers are left alone
+APP_LOGGER = "app"
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+LOG_RECORDS_DROPPED = counter("willmo_log_records_dropped_total", "Log records dropped because the log queue was full")
+
+# Id of the request being handled; copied into tasks (and, by run_in_executor, threads)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via `extra` and is a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "sample_rate"}
+
+_listener: Optional[QueueListener] = None
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Stamp records with the current request id, and sample high-volume events.
+
+    Runs on the logging call's thread, where the request context is visible. A
+    record logged with extra={"sample_rate": r} is kept with probability r;
+    warnings and errors are always kept.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        rate = getattr(record, "sample_rate", None)
+        if rate is not None and record.levelno < logging.WARNING and random.random() >= rate:
+            return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request_id, then any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if getattr(record, "sample_rate", None) is not None:
+            entry["sample_rate"] = record.sample_rate
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development; extra fields are appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+        if getattr(record, "request_id", None):
+            fields = {"request_id": record.request_id, **fields}
+        if fields:
+            first, newline, rest = line.partition("\n")
+            line = first + " " + " ".join(f"{k}={v}" for k, v in fields.items()) + newline + rest
+        return line
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without blocking the caller.
+
+    When the queue is full the record is dropped and counted rather than
+    stalling the event loop behind stdout.
+    """
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback now, while args and exc_info are
+        # still valid, but leave formatting to the listener's handler
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """
+    Route the app's logs through a bounded queue to a background thread that
+    formats and writes them, so logging calls never do stdout I/O on the loop.
+    Called from the lifespan; safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    handler = _DroppingQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+
+    logger = logging.getLogger(APP_LOGGER)
+    logger.handlers = [handler]
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+access_logger = logging.getLogger("app.access")
+
+
+class RequestContextMiddleware:
+    """
+    Give every request an id (the caller's X-Request-ID if it sent a sane one),
+    echo it in the response, make it available to log records, and write a
+    sampled access log line with the status and duration. Server errors and
+    slow requests are always logged.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _incoming_id(scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                if 0 < len(candidate) <= 128 and candidate.isprintable():
+                    return candidate
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = self._incoming_id(scope) or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration_ms = round((time.perf_counter() - start) * 1000, 1)
+            fields = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": duration_ms,
+            }
+            if status >= 500:
+                access_logger.error("request failed", extra=fields)
+            elif duration_ms >= settings.LOG_SLOW_REQUEST_MS:
+                access_logger.warning("slow request", extra=fields)
+            else:
+                access_logger.info("request", extra={**fields, "sample_rate": settings.LOG_SAMPLE_RATE})
+            request_id_var.reset(token)
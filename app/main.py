@@ -1,16 +1,61 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.micro_goals.router import router as microgoals_router
 from app.Voice_assistant.voice_router import router as voice_router 
 from app.chat.chat_router import router as chat_router
 from app.config import settings
 from fastapi.middleware.cors import CORSMiddleware 
-from fastapi.staticfiles import StaticFiles
-from app.cleanup_audio import start_cleanup_thread
+from app.audio_store import audio_store
+from app.audio_delivery import router as audio_router
+from app.openai_client import close_openai_client
+from app.upload_limit import UploadSizeLimitMiddleware
+from app.single_flight import all_stats as single_flight_stats
+from app.metrics import MetricsMiddleware, registry as metrics_registry
+from app.admission import all_stats as admission_stats
+from app.executors import shutdown_executors
+from app.resilience import all_stats as upstream_stats
+from app.services import services
+from app.logging_setup import RequestContextMiddleware, setup_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    if settings.WEB_CONCURRENCY > 1:
+        logger.warning(
+            "Chat session history and the micro-goal task index are per worker; with several "
+            "workers a user's requests see different state",
+            extra={"workers": settings.WEB_CONCURRENCY}
+        )
+    settings.ensure_directories()
+    audio_store.start()
+    logger.info("Audio store indexed; expiry runs on the event loop")
+    # Services are lazy; build them in the background so the first requests do not
+    # pay for it, without delaying readiness
+    warmup = asyncio.create_task(services.warm_up()) if settings.SERVICE_WARMUP_ON_STARTUP else None
+    try:
+        yield
+    finally:
+        if warmup is not None and not warmup.done():
+            warmup.cancel()
+        await audio_store.stop()
+        await close_openai_client()
+        services.reset()
+        shutdown_executors()
+        shutdown_logging()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     description=settings.APP_DESCRIPTION,
     version=settings.APP_VERSION,
+    lifespan=lifespan,
 )
 
 # Fixed middleware configuration
@@ -22,18 +67,46 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-app.mount("/audio", StaticFiles(directory="/app/audio"), name="audio")
+# Abort oversized voice uploads while they stream in; the per-format limit is
+# checked by the voice routes
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=max(settings.MAX_AUDIO_UPLOAD_BYTES, settings.MAX_SEGMENTABLE_UPLOAD_BYTES),
+    path_prefixes=["/api/voice/"]
+)
+
+# Inside the request-id middleware only, so request timings include CORS and the upload limit
+app.add_middleware(MetricsMiddleware)
+
+# Request ids and the access log; wraps everything so all of a request's logs carry its id
+app.add_middleware(RequestContextMiddleware)
+
 # Mount routers
+app.include_router(audio_router, tags=["Audio"])
 app.include_router(microgoals_router, prefix="/api/microgoals", tags=["Micro Goals"])
 app.include_router(voice_router, prefix="/api/voice", tags=["Voice Assistant"])
 app.include_router(chat_router, prefix="/api/chat", tags=["Chat"])
 
-@app.on_event("startup")
-def on_startup():
-    start_cleanup_thread()
-    print("[Startup] Cleanup thread running inside Docker container")
-
 @app.get("/")
 async def root():
     return {"message": f"{settings.APP_NAME} is running!"}
 
+@app.get("/stats/single-flight")
+async def single_flight_stats_route():
+    """Upstream calls issued (leaders) vs. requests that joined an identical in-flight call (coalesced)"""
+    return single_flight_stats()
+
+@app.get("/stats/admission")
+async def admission_stats_route():
+    """Per-endpoint active and queued requests, and how many were turned away"""
+    return admission_stats()
+
+@app.get("/stats/upstream")
+async def upstream_stats_route():
+    """Circuit breaker state and current hedging delay per upstream operation"""
+    return upstream_stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of latency histograms, token usage, cache and in-flight metrics"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
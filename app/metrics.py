@@ -0,0 +1,294 @@
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds: sub-millisecond local work up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum)
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the wall-clock duration of the enclosed block, including on error."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Process-local metric registry rendered in the Prometheus text format.
+
+    Collectors are callbacks run at scrape time that refresh gauges from
+    component stats (caches, coalescing groups), so hot paths that already
+    keep counters do not need to report twice.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                logger.exception("Metrics collector failed")
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, tuple(labelnames)))
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, tuple(labelnames)))
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, documentation, tuple(labelnames), buckets))
+
+
+# ── Shared application metrics
+
+HTTP_REQUEST_DURATION = histogram(
+    "willmo_http_request_duration_seconds",
+    "Time to serve an HTTP request, by route template and status",
+    ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = gauge("willmo_http_requests_in_flight", "HTTP requests being served")
+
+STAGE_DURATION = histogram(
+    "willmo_stage_duration_seconds",
+    "Time spent in one stage of request handling (upload_read, temp_io, json_parse, file_verify, ...)",
+    ["stage"]
+)
+
+UPSTREAM_DURATION = histogram(
+    "willmo_upstream_duration_seconds",
+    "OpenAI call latency by operation (for streams: until the response starts)",
+    ["operation", "outcome"]
+)
+UPSTREAM_IN_FLIGHT = gauge("willmo_upstream_in_flight", "OpenAI calls in progress", ["operation"])
+
+LLM_TOKENS = counter("willmo_llm_tokens_total", "Tokens reported by completions", ["operation", "kind"])
+
+CACHE_LOOKUPS = counter("willmo_cache_lookups_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"])
+
+SINGLE_FLIGHT_CALLS = counter(
+    "willmo_single_flight_calls_total",
+    "Calls through a coalescing group: leader (went upstream) or coalesced (shared a result)",
+    ["group", "role"]
+)
+SINGLE_FLIGHT_IN_FLIGHT = gauge("willmo_single_flight_in_flight", "Distinct keys currently in flight", ["group"])
+
+
+def time_stage(stage: str):
+    """Context manager timing one named stage into willmo_stage_duration_seconds."""
+    return STAGE_DURATION.time(stage=stage)
+
+
+@contextmanager
+def track_upstream(operation: str) -> Iterator[None]:
+    """Time an upstream call and count it as in flight while it runs."""
+    start = time.perf_counter()
+    outcome = "error"
+    UPSTREAM_IN_FLIGHT.inc(operation=operation)
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        UPSTREAM_IN_FLIGHT.dec(operation=operation)
+        UPSTREAM_DURATION.observe(time.perf_counter() - start, operation=operation, outcome=outcome)
+
+
+def record_usage(operation: str, usage) -> None:
+    """Add a completion's token usage (object or dict) to willmo_llm_tokens_total."""
+    if usage is None:
+        return
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = usage.get(kind)
+        if isinstance(value, (int, float)):
+            LLM_TOKENS.inc(value, operation=operation, kind=kind.replace("_tokens", ""))
+
+
+class MetricsMiddleware:
+    """
+    Record request duration and in-flight count per route template, and time
+    how long the request body takes to arrive (the upload_read stage).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = "500"
+        body_started: Optional[float] = None
+
+        async def timed_receive():
+            nonlocal body_started
+            message = await receive()
+            if message["type"] == "http.request":
+                if body_started is None:
+                    body_started = time.perf_counter()
+                if not message.get("more_body", False) and message.get("body"):
+                    STAGE_DURATION.observe(time.perf_counter() - body_started, stage="upload_read")
+            return message
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, timed_receive, recording_send)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; use its template to
+            # keep label cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route_path,
+                status=status
+            )
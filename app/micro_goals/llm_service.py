@@ -1,132 +1,340 @@
-import os
-import openai
-from dotenv import load_dotenv
-from .request import micro_goal_response
+import json
+import asyncio
+import logging
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+from fastapi import HTTPException
+from pydantic import BaseModel
+from .request import micro_goal_response, DayPlan
 from app.config import settings
+from app.openai_client import get_openai_client
+from app.token_budget import compact_tasks
+from app.micro_goals.task_index import TaskSet, past_task_index
+from app.single_flight import make_key, single_flight_group
+from app.metrics import record_usage, time_stage, track_upstream
+from app.resilience import micro_goal_policy, upstream_http_error
+from app.admission import AdmissionLimiter
 
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+VALID_CATEGORIES = ["mind", "soul", "body", "purpose", "spirituality"]
+
+# Output budget for regenerating a single day_plan entry
+REPAIR_TOKENS_PER_ENTRY = 150
+
+
+def strict_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Convert a pydantic model's JSON schema into the strict form required by
+    OpenAI structured outputs: $refs inlined, no titles, every property required
+    and no additional properties.
+    """
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def convert(node: Any) -> Any:
+        if isinstance(node, list):
+            return [convert(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if "$ref" in node:
+            return convert(defs[node["$ref"].split("/")[-1]])
+        converted = {key: convert(value) for key, value in node.items() if key not in ("title", "properties")}
+        if "properties" in node:
+            # Keys here are field names (a field may itself be called "title")
+            converted["properties"] = {name: convert(prop) for name, prop in node["properties"].items()}
+        if converted.get("type") == "object":
+            converted["additionalProperties"] = False
+            converted["required"] = list(converted.get("properties", {}))
+        return converted
+
+    return convert(schema)
+
+
+def _with_category_enum(schema: Dict[str, Any], allowed_categories: List[str]) -> Dict[str, Any]:
+    schema["properties"]["day_plan"]["items"]["properties"]["category"]["enum"] = list(allowed_categories)
+    return schema
+
+
+def plan_json_schema(allowed_categories: List[str]) -> Dict[str, Any]:
+    """response_format json_schema for a full micro_goal_response."""
+    schema = _with_category_enum(strict_json_schema(micro_goal_response), allowed_categories)
+    return {"name": "micro_goal_response", "strict": True, "schema": schema}
+
+
+def entries_json_schema(allowed_categories: List[str]) -> Dict[str, Any]:
+    """response_format json_schema for a bare {"day_plan": [...]} used when regenerating entries."""
+    plan_schema = strict_json_schema(micro_goal_response)
+    schema = {
+        "type": "object",
+        "properties": {"day_plan": plan_schema["properties"]["day_plan"]},
+        "required": ["day_plan"],
+        "additionalProperties": False,
+    }
+    return {"name": "day_plan_entries", "strict": True, "schema": _with_category_enum(schema, allowed_categories)}
+
+# Static instructions, sent first and unchanged on every call so the provider's
+# prompt cache can reuse them. Everything user-specific goes in the user message.
+MICRO_GOAL_SYSTEM_PROMPT = """You are an AI assistant specialized in creating personalized micro goals for one day. Your task is to generate a daily plan based on the user's information, ensuring the content is age-appropriate and actionable.
+
+**Age Safety & Style:**
+- Ages 0–12: Fun, friendly, educational. Allowed: school topics, homework, daily life, simple games. fitness routine task allowed,(give General fitness routine task), hobbies allowed, Forbid: job tips, career advice, interview prep, job posting  adult topics.
+- Ages 13–17: Practical, motivational, study-focused personal growth; general job tips/interview basics/resume tips allowed. createa fitness routine task, goals, mental peace, project, hobbies, Avoid adult-specific content (e.g., sexual content). Health/fitness → only general, safe guidance.
+- Ages 18+: Professional, goal-oriented, personalized; allowed: career development, interview prep, personal development, fitness/health goals, mental peace, project hobbies, job posting, job tips, career advice, interview prep.
+
+**CRITICAL: Task Uniqueness Requirements:**
+- NEVER repeat or suggest tasks that are already in the past tasks list
+- Each generated task MUST be completely different from previous suggestions
+- If a similar concept was used before, find a different approach or angle
+- Be creative and innovative with new task suggestions
+- Review the past tasks carefully before generating new ones
+
+**Planning Instructions:**
+1) Analyze: user age, allowed focus areas, and the Big Goal.
+2) Review the past tasks given in the personalization data - AVOID all of these completely.
+3) Generate: EXACTLY 5 NEW, UNIQUE daily micro plans aligned to the Big Goal.
+4) Categories MUST be restricted to ONLY the allowed_categories given in the personalization data. DO NOT invent other categories.
+5) If exactly one category is provided, ALL 5 tasks MUST use that category. If two are provided, use ONLY those two across all 5 tasks.
+6) Ensure: age-appropriate, actionable tasks that haven't been suggested before.
+7) Output: ONLY JSON (no extra text), short and clear.
+
+**JSON Output Contract (strict):**
+{
+"big_goal": "<the user's big_goal, unchanged>",
+"day_plan": [
+    { "category": "<one of allowed_categories>", "title": "<short task title>", "goal": "<string>" },
+    { "category": "<one of allowed_categories>", "title": "<short task title>", "goal": "<string>" },
+    { "category": "<one of allowed_categories>", "title": "<short task title>", "goal": "<string>" },
+    { "category": "<one of allowed_categories>", "title": "<short task title>", "goal": "<string>" },
+    { "category": "<one of allowed_categories>", "title": "<short task title>", "goal": "<string>" }
+]
+}
+
+**MANDATORY RULES:**
+1. NEVER suggest tasks that appear in the past tasks list
+2. Each task must be completely new and unique
+3. Be creative and think of alternative approaches to support the big goal
+4. Tasks must be age-appropriate and actionable
+5. Use ONLY the allowed categories listed in the personalization data; no others are permitted
+6. If you're running out of ideas, think of different contexts, methods, or perspectives
+
+**Return ONLY the JSON object above. No additional commentary.**
+
+Create a completely NEW personalized daily plan with tasks that have NEVER been suggested before."""
+
 
 class Micro_goal:
     def __init__(self):
-        self.client = openai.OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=settings.OPENAI_API_BASE
-        )
+        self.client = get_openai_client()
+        self.task_index = past_task_index
+        self.inflight = single_flight_group("micro_goal_completion")
 
-    def create_daily_plan(self, input_data: dict) -> micro_goal_response:
-        prompt = self.create_prompt(input_data)
-        response = self.get_ai_response(prompt)
-        return response
+    async def create_daily_plan(self, input_data: dict) -> micro_goal_response:
+        # Tasks already given to this user: the per-user index when user_id is known,
+        # otherwise just the tasks sent with this request
+        user_id = input_data.get('user_id')
+        past_tasks = self.task_index.for_user(user_id) if user_id else self.task_index.new_task_set()
+        past_tasks.add_many(input_data.get('tasks'))
 
-    def create_prompt(self, input_data: dict) -> str:
-            # Derive allowed categories from userdata (comma-separated), fallback to all if empty
-            raw_userdata = str(input_data.get('userdata', '') or '')
-            parsed_categories = [c.strip().lower() for c in raw_userdata.split(',') if c.strip()]
-            valid_categories = ["mind", "soul", "body", "purpose", "spirituality"]
-            allowed_categories = [c for c in parsed_categories if c in valid_categories] or valid_categories
-
-            return f"""You are an AI assistant specialized in creating personalized micro goals for one day. Your task is to generate a daily plan based on the user's information, ensuring the content is age-appropriate and actionable.
-
-            **Age Safety & Style:**
-            - Ages 0–12: Fun, friendly, educational. Allowed: school topics, homework, daily life, simple games. fitness routine task allowed,(give General fitness routine task), hobbies allowed, Forbid: job tips, career advice, interview prep, job posting  adult topics.
-            - Ages 13–17: Practical, motivational, study-focused personal growth; general job tips/interview basics/resume tips allowed. createa fitness routine task, goals, mental peace, project, hobbies, Avoid adult-specific content (e.g., sexual content). Health/fitness → only general, safe guidance.
-            - Ages 18+: Professional, goal-oriented, personalized; allowed: career development, interview prep, personal development, fitness/health goals, mental peace, project hobbies, job posting, job tips, career advice, interview prep.
-
-            **CRITICAL: Task Uniqueness Requirements:**
-            - NEVER repeat or suggest tasks that are already in the past tasks list
-            - Each generated task MUST be completely different from previous suggestions
-            - If a similar concept was used before, find a different approach or angle
-            - Be creative and innovative with new task suggestions
-            - Review the past tasks carefully before generating new ones
-
-            **Planning Instructions:**
-            1) Analyze: user age, allowed focus areas, and the Big Goal.
-            2) Review past tasks: {input_data['tasks']} - AVOID all of these completely.
-            3) Generate: EXACTLY 5 NEW, UNIQUE daily micro plans aligned to the Big Goal.
-            4) Categories MUST be restricted to ONLY these: {allowed_categories}. DO NOT invent other categories.
-            5) If exactly one category is provided, ALL 5 tasks MUST use that category. If two are provided, use ONLY those two across all 5 tasks.
-            6) Ensure: age-appropriate, actionable tasks that haven't been suggested before.
-            7) Output: ONLY JSON (no extra text), short and clear.
-
-            **JSON Output Contract (strict):**
-            {{
-            "big_goal": "{input_data['big_goal']}",
-            "day_plan": [
-                {{ "category": "<one of {allowed_categories}>", "title": "<short task title>", "goal": "<string>" }},
-                {{ "category": "<one of {allowed_categories}>", "title": "<short task title>", "goal": "<string>" }},
-                {{ "category": "<one of {allowed_categories}>", "title": "<short task title>", "goal": "<string>" }},
-                {{ "category": "<one of {allowed_categories}>", "title": "<short task title>", "goal": "<string>" }},
-                {{ "category": "<one of {allowed_categories}>", "title": "<short task title>", "goal": "<string>" }}
-            ]
-            }}
-
-            **Personalization Data:**
-            - big_goal: {input_data['big_goal']}
-            - age: {input_data['age']}
-            - userdata: {input_data['userdata']}
-            - allowed_categories: {allowed_categories}
-            - past tasks to AVOID: {input_data['tasks']}
-
-            **MANDATORY RULES:**
-            1. NEVER suggest tasks that appear in the past tasks list
-            2. Each task must be completely new and unique
-            3. Be creative and think of alternative approaches to support the big goal
-            4. Tasks must be age-appropriate and actionable
-            5. Use ONLY the allowed categories listed above; no others are permitted
-            6. If you're running out of ideas, think of different contexts, methods, or perspectives
-
-            **Return ONLY the JSON object above. No additional commentary.**
-
-            Create a completely NEW personalized daily plan with tasks that have NEVER been suggested before.
-            """
-
-
-    def get_ai_response(self, prompt: str) -> micro_goal_response:
-        import json
-        from fastapi import HTTPException
-        import re
-
-        completion = self.client.chat.completions.create(
-            model=settings.CHAT_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=700
+        messages = self.create_prompt(input_data, past_tasks)
+        response = await self.get_ai_response(
+            messages,
+            self.allowed_categories(input_data),
+            input_data['big_goal'],
+            past_tasks
         )
-        response_text = completion.choices[0].message.content.strip()
-        
+        past_tasks.add_many(response.day_plan)
+        return response
+
+    async def iter_daily_plans(
+        self,
+        items: List[dict],
+        admission: Optional[AdmissionLimiter] = None
+    ) -> AsyncIterator[Tuple[int, Optional[micro_goal_response], Optional[str]]]:
+        """
+        Generate plans for many users concurrently, at most MICRO_GOAL_BATCH_CONCURRENCY
+        at a time. Yields (index, plan, error) in completion order; exactly one of
+        plan/error is set for each input item.
+
+        With `admission`, every item holds its own slot while it runs, so a batch
+        counts against the limiter like the same number of single requests; an
+        item turned away by it is reported as that item's error.
+        """
+        semaphore = asyncio.Semaphore(settings.MICRO_GOAL_BATCH_CONCURRENCY)
+
+        async def run(index: int, item: dict):
+            async with semaphore:
+                try:
+                    async with admission.slot() if admission is not None else nullcontext():
+                        return index, await self.create_daily_plan(item), None
+                except HTTPException as e:
+                    return index, None, str(e.detail)
+                except Exception as e:
+                    return index, None, str(e)
+
+        tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(items)]
         try:
-            # Remove markdown code blocks if present
-            response_text = re.sub(r'^```(?:json)?\s*', '', response_text, flags=re.MULTILINE)
-            response_text = re.sub(r'\s*```$', '', response_text, flags=re.MULTILINE)
-            
-            # Clean up whitespace and newlines
-            response_text = response_text.encode('utf-8').decode('utf-8-sig')
-            response_text = re.sub(r'[\r\n\t]', '', response_text)
-
-            # Ensure proper JSON boundaries
-            if not response_text.startswith('{'): 
-                response_text = '{' + response_text
-            if not response_text.endswith('}'): 
-                response_text = response_text + '}'
-
-            response_dict = json.loads(response_text)
-            
-            if not isinstance(response_dict, dict):
-                raise ValueError("Response is not a dictionary")
-            if 'big_goal' not in response_dict:
-                raise ValueError("Missing 'big_goal' field")
-            if 'day_plan' not in response_dict:
-                raise ValueError("Missing 'day_plan' field")
-            if not isinstance(response_dict['day_plan'], list):
-                raise ValueError("'day_plan' is not a list")
-
-            return micro_goal_response(**response_dict)
-            
-        except json.JSONDecodeError as e:
-            print(f"Invalid JSON response: {response_text}")
-            raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away or the consumer stopped early
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def allowed_categories(input_data: dict) -> List[str]:
+        # Derive allowed categories from userdata (comma-separated), fallback to all if empty
+        raw_userdata = str(input_data.get('userdata', '') or '')
+        parsed_categories = [c.strip().lower() for c in raw_userdata.split(',') if c.strip()]
+        return [c for c in parsed_categories if c in VALID_CATEGORIES] or VALID_CATEGORIES
+
+    def create_prompt(self, input_data: dict, past_tasks: Optional[TaskSet] = None) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for one daily plan: the static system prompt followed
+        by the user's personalization data. Only the most recent past tasks that fit
+        in MICRO_GOAL_TASKS_TOKEN_BUDGET are listed; older ones are enforced by the
+        similarity filter instead, so the prompt size stays constant per user.
+        """
+        allowed_categories = self.allowed_categories(input_data)
+        known = past_tasks.recent() if past_tasks is not None else input_data.get('tasks')
+        recent_tasks = compact_tasks(known, settings.MICRO_GOAL_TASKS_TOKEN_BUDGET)
+
+        user_prompt = f"""**Personalization Data:**
+- big_goal: {input_data['big_goal']}
+- age: {input_data['age']}
+- userdata: {input_data['userdata']}
+- allowed_categories: {allowed_categories}
+- past tasks to AVOID: {json.dumps(recent_tasks, ensure_ascii=False)}"""
+
+        return [
+            {"role": "system", "content": MICRO_GOAL_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
+
+
+    async def get_ai_response(
+        self,
+        messages: List[Dict[str, str]],
+        allowed_categories: List[str],
+        big_goal: str,
+        past_tasks: Optional[TaskSet] = None
+    ) -> micro_goal_response:
+        """
+        Generate a plan with a strict JSON schema and validate it locally.
+
+        Entries with a disallowed category, empty fields, or that nearly repeat a
+        past task or another entry are dropped, and only the missing entries are
+        regenerated (up to MICRO_GOAL_REPAIR_ATTEMPTS times) instead of the whole plan.
+        """
+        plan_size = settings.MICRO_GOAL_PLAN_SIZE
+        if past_tasks is None:
+            past_tasks = self.task_index.new_task_set()
+        rejected: List[str] = []
+        try:
+            data = await self._complete_json(
+                messages,
+                plan_json_schema(allowed_categories),
+                max_tokens=settings.MICRO_GOAL_MAX_TOKENS
+            )
+            day_plan = self._valid_entries(data.get("day_plan"), allowed_categories, past_tasks, [], rejected)
+
+            attempts = 0
+            while len(day_plan) < plan_size and attempts < settings.MICRO_GOAL_REPAIR_ATTEMPTS:
+                attempts += 1
+                missing = plan_size - len(day_plan)
+                logger.info("Regenerating invalid or missing day_plan entries", extra={"missing": missing, "attempt": attempts})
+                repair = await self._complete_json(
+                    messages + [{"role": "user", "content": self._repair_prompt(day_plan, missing, allowed_categories, rejected)}],
+                    entries_json_schema(allowed_categories),
+                    max_tokens=REPAIR_TOKENS_PER_ENTRY * missing
+                )
+                day_plan += self._valid_entries(
+                    repair.get("day_plan"), allowed_categories, past_tasks, day_plan, rejected
+                )[:missing]
+
+            if len(day_plan) < plan_size:
+                raise ValueError(f"Only {len(day_plan)} of {plan_size} valid day_plan entries after regeneration")
+
+            return micro_goal_response(big_goal=big_goal, day_plan=day_plan[:plan_size])
+
+        except HTTPException:
+            raise
         except ValueError as e:
             raise HTTPException(status_code=500, detail=f"Invalid response structure: {str(e)}")
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error processing response: {str(e)}")
+            raise upstream_http_error(e, "Error processing response") or HTTPException(
+                status_code=500, detail=f"Error processing response: {str(e)}"
+            )
+
+    async def _complete_json(self, messages: List[Dict[str, str]], schema: dict, max_tokens: int) -> dict:
+        """Run a chat completion constrained to `schema` and return the parsed object."""
+        request = dict(
+            model=settings.CHAT_MODEL,
+            messages=messages,
+            temperature=settings.MICRO_GOAL_TEMPERATURE,
+            max_tokens=max_tokens,
+            response_format={"type": "json_schema", "json_schema": schema}
+        )
+        # Identical requests in flight at the same time share one upstream call
+        completion = await self.inflight.do(make_key(request), lambda: self._complete(request))
+        message = completion.choices[0].message
+        if getattr(message, "refusal", None):
+            raise ValueError(f"Model refused: {message.refusal}")
+        try:
+            with time_stage("json_parse"):
+                data = json.loads(message.content or "")
+        except json.JSONDecodeError as e:
+            # Usually a completion cut off by max_tokens; treat as no valid entries
+            # Position only; the raw response is not logged
+            logger.warning("Unparseable JSON response, will regenerate", extra={"error": str(e)})
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    async def _complete(self, request: dict):
+        with track_upstream("micro_goal"):
+            completion = await micro_goal_policy.call(lambda: self.client.chat.completions.create(**request))
+        record_usage("micro_goal", completion.usage)
+        return completion
+
+    @staticmethod
+    def _valid_entries(
+        entries,
+        allowed_categories: List[str],
+        past_tasks: TaskSet,
+        existing: List[DayPlan],
+        rejected: List[str]
+    ) -> List[DayPlan]:
+        """
+        Keep well-formed entries with an allowed category that are not near-duplicates
+        of past tasks or of entries already accepted. Duplicate titles go to `rejected`.
+        """
+        valid: List[DayPlan] = []
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            category = str(entry.get("category") or "").strip().lower()
+            title = str(entry.get("title") or "").strip()
+            goal = str(entry.get("goal") or "").strip()
+            if category not in allowed_categories or not title or not goal:
+                continue
+            duplicate_of = past_tasks.find_duplicate(title, goal, also_check=existing + valid)
+            if duplicate_of:
+                logger.debug("Dropping task too similar to a past task", extra={"title": title, "duplicate_of": duplicate_of})
+                rejected.append(title)
+                continue
+            valid.append(DayPlan(category=category, title=title, goal=goal))
+        return valid
+
+    @staticmethod
+    def _repair_prompt(day_plan: List[DayPlan], missing: int, allowed_categories: List[str], rejected: List[str]) -> str:
+        kept = [plan.dict() for plan in day_plan]
+        prompt = (
+            f"Your plan had invalid or missing entries. These entries are accepted: "
+            f"{json.dumps(kept, ensure_ascii=False)}. Generate EXACTLY {missing} more NEW day_plan "
+            f"entries that differ from them and from the past tasks, using ONLY these categories: "
+            f"{allowed_categories}. Return ONLY JSON: {{\"day_plan\": [...]}}."
+        )
+        if rejected:
+            prompt += f" These were rejected as repeats of past tasks, avoid anything similar: {json.dumps(rejected, ensure_ascii=False)}."
+        return prompt
@@ -3,6 +3,7 @@ from typing import Optional,List, Any, Dict
 
 
 class micro_goal_request(BaseModel):
+    user_id: Optional[str] = None
     big_goal: str 
     age: int 
     userdata: str
@@ -16,3 +17,15 @@ class DayPlan(BaseModel):
 class micro_goal_response(BaseModel):
     big_goal: str
     day_plan: List[DayPlan]
+
+
+class micro_goal_batch_request(BaseModel):
+    items: List[micro_goal_request]
+
+class micro_goal_batch_item(BaseModel):
+    index: int
+    result: Optional[micro_goal_response] = None
+    error: Optional[str] = None
+
+class micro_goal_batch_response(BaseModel):
+    results: List[micro_goal_batch_item]
@@ -1,14 +1,82 @@
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.admission import micro_goal_admission
+from app.resilience import PASSTHROUGH_STATUS_CODES
 from app.micro_goals.llm_service import Micro_goal
-from app.micro_goals.request import micro_goal_response, micro_goal_request
+from app.services import lazy_service
+from app.micro_goals.request import (
+    micro_goal_response,
+    micro_goal_request,
+    micro_goal_batch_request,
+    micro_goal_batch_item,
+    micro_goal_batch_response,
+)
 
 router = APIRouter()
-micro_goal= Micro_goal()     
+micro_goal = lazy_service("micro_goal", Micro_goal)
 
 @router.post("/micro_goal", response_model=micro_goal_response)
 async def create_daily_plan(request: micro_goal_request):
     try:
-        response = micro_goal.create_daily_plan(request.dict())
+        async with micro_goal_admission.slot():
+            response = await micro_goal.create_daily_plan(request.dict())
         return response
+    except HTTPException as e:
+        if e.status_code in PASSTHROUGH_STATUS_CODES:
+            raise
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _validate_batch(request: micro_goal_batch_request, max_items: int, hint: str = ""):
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one item")
+    if len(request.items) > max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(request.items)} items (max {max_items}){hint}"
+        )
+
+
+@router.post("/micro_goal/batch", response_model=micro_goal_batch_response)
+async def create_daily_plans_batch(request: micro_goal_batch_request):
+    """
+    Generate daily plans for many users at once; results are returned in input order.
+    Limited to MICRO_GOAL_BATCH_SYNC_MAX_ITEMS so the response arrives before proxy
+    read timeouts; larger batches go to /micro_goal/batch/stream.
+    """
+    _validate_batch(
+        request,
+        settings.MICRO_GOAL_BATCH_SYNC_MAX_ITEMS,
+        hint="; use /api/microgoals/micro_goal/batch/stream for larger batches"
+    )
+    results = [None] * len(request.items)
+    items = [item.dict() for item in request.items]
+    async for index, plan, error in micro_goal.iter_daily_plans(items, admission=micro_goal_admission):
+        results[index] = micro_goal_batch_item(index=index, result=plan, error=error)
+    return micro_goal_batch_response(results=results)
+
+
+@router.post("/micro_goal/batch/stream", summary="Batch daily plans streamed as NDJSON")
+async def stream_daily_plans_batch(request: micro_goal_batch_request):
+    """
+    Generate daily plans for many users at once, streaming one JSON line per item
+    ({"index", "result", "error"}) as soon as it completes.
+    """
+    _validate_batch(request, settings.MICRO_GOAL_BATCH_MAX_ITEMS)
+    items = [item.dict() for item in request.items]
+
+    # Admission slots are taken per item as it runs, inside the stream
+    async def ndjson_lines():
+        async for index, plan, error in micro_goal.iter_daily_plans(items, admission=micro_goal_admission):
+            item = micro_goal_batch_item(index=index, result=plan, error=error)
+            yield json.dumps(item.dict(), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,130 @@
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, FrozenSet, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+
+_PUNCT_RE = re.compile(r"[^\w\s]+|_", re.UNICODE)
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower()
+    # Punctuation is dropped rather than spaced so "10,000" matches "10000"
+    return " ".join(_PUNCT_RE.sub("", text).split())
+
+
+def _shingles(text: str, n: int = 3) -> FrozenSet[str]:
+    """Character n-grams of the normalized text, padded so short words still count."""
+    if not text:
+        # Nothing to compare; two empty titles are not a repeat of each other
+        return frozenset()
+    padded = f" {text} "
+    if len(padded) <= n:
+        return frozenset([padded])
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _title_goal(task: Any) -> Tuple[str, str]:
+    if isinstance(task, dict):
+        return str(task.get("title") or "").strip(), str(task.get("goal") or "").strip()
+    return str(getattr(task, "title", "") or "").strip(), str(getattr(task, "goal", "") or "").strip()
+
+
+class _Entry:
+    __slots__ = ("title", "goal", "title_shingles", "text_shingles")
+
+    def __init__(self, title: str, goal: str):
+        self.title = title
+        self.goal = goal
+        self.title_shingles = _shingles(_normalize(title))
+        self.text_shingles = _shingles(_normalize(f"{title} {goal}"))
+
+
+class TaskSet:
+    """
+    Previously issued tasks for one user, with near-duplicate detection by
+    character-trigram Jaccard similarity of the title and of title + goal.
+    """
+
+    def __init__(self, max_tasks: int, threshold: float):
+        self.max_tasks = max_tasks
+        self.threshold = threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # normalized text -> entry, oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_many(self, tasks: Optional[Iterable[Any]]):
+        with self._lock:
+            for task in tasks or []:
+                title, goal = _title_goal(task)
+                if not title and not goal:
+                    continue
+                key = _normalize(f"{title} {goal}")
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    continue
+                self._entries[key] = _Entry(title, goal)
+                while len(self._entries) > self.max_tasks:
+                    self._entries.popitem(last=False)
+
+    def find_duplicate(self, title: str, goal: str, also_check: Iterable[Any] = ()) -> Optional[str]:
+        """Return the title of a known task that `title`/`goal` nearly repeats, if any."""
+        candidate = _Entry(title, goal)
+        with self._lock:
+            known = list(self._entries.values())
+        known += [_Entry(*_title_goal(task)) for task in also_check]
+
+        for entry in known:
+            if (
+                _jaccard(candidate.title_shingles, entry.title_shingles) >= self.threshold
+                or _jaccard(candidate.text_shingles, entry.text_shingles) >= self.threshold
+            ):
+                return entry.title or entry.goal
+        return None
+
+    def recent(self) -> List[dict]:
+        """Known tasks as {"title", "goal"} dicts, oldest first."""
+        with self._lock:
+            return [{"title": e.title, "goal": e.goal} for e in self._entries.values()]
+
+
+class PastTaskIndex:
+    """Per-user TaskSets kept in an LRU so memory stays bounded across users."""
+
+    def __init__(self, max_users: int, max_tasks_per_user: int, threshold: float):
+        self.max_users = max_users
+        self.max_tasks_per_user = max_tasks_per_user
+        self.threshold = threshold
+        self._users: "OrderedDict[str, TaskSet]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def new_task_set(self) -> TaskSet:
+        return TaskSet(self.max_tasks_per_user, self.threshold)
+
+    def for_user(self, user_id: str) -> TaskSet:
+        with self._lock:
+            task_set = self._users.get(user_id)
+            if task_set is None:
+                task_set = self._users[user_id] = self.new_task_set()
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return task_set
+
+
+past_task_index = PastTaskIndex(
+    max_users=settings.MICRO_GOAL_INDEX_MAX_USERS,
+    max_tasks_per_user=settings.MICRO_GOAL_INDEX_MAX_TASKS_PER_USER,
+    threshold=settings.MICRO_GOAL_SIMILARITY_THRESHOLD,
+)
@@ -0,0 +1,70 @@
+import logging
+import threading
+import importlib.util
+from typing import TYPE_CHECKING, Optional
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# The openai package takes the better part of a second to import, so it is
+# imported when the client is first built rather than when the app loads
+_client: Optional["AsyncOpenAI"] = None
+# Services may be built concurrently (warm-up thread and first requests); one client only
+_client_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional `h2` package is installed
+    return importlib.util.find_spec("h2") is not None
+
+
+def get_openai_client() -> "AsyncOpenAI":
+    """
+    Return the process-wide AsyncOpenAI client.
+
+    Every service shares this one client so all upstream calls go through a
+    single pooled, keep-alive connection set instead of one pool per service.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            if not settings.OPENAI_API_KEY:
+                raise ValueError("OPENAI_API_KEY is required")
+
+            import httpx
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            http2 = settings.OPENAI_HTTP2 and _http2_available()
+            if settings.OPENAI_HTTP2 and not http2:
+                logger.warning("h2 package not installed, falling back to HTTP/1.1")
+
+            _client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_API_BASE,
+                timeout=settings.OPENAI_TIMEOUT,
+                # Retries are done by app/resilience.py, with backoff and circuit breaking
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(
+                    http2=http2,
+                    limits=httpx.Limits(
+                        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+                    ),
+                ),
+            )
+    return _client
+
+
+async def close_openai_client() -> None:
+    """Close the shared client and its connection pool (called on shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
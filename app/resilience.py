@@ -0,0 +1,273 @@
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.metrics import counter, gauge, registry
+
+
+T = TypeVar("T")
+
+UPSTREAM_RETRIES = counter("willmo_upstream_retries_total", "Upstream attempts retried after a transient error", ["operation"])
+UPSTREAM_HEDGES = counter("willmo_upstream_hedges_total", "Hedged duplicate requests by which attempt won", ["operation", "winner"])
+CIRCUIT_OPEN = gauge("willmo_circuit_open", "1 while the operation's circuit breaker is open", ["operation"])
+
+# Status codes routers pass through unchanged instead of wrapping them in a 500
+PASSTHROUGH_STATUS_CODES = (429, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, operation: str, retry_after: float):
+        super().__init__(f"{operation} upstream is unavailable (circuit open)")
+        self.operation = operation
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive upstream failures.
+
+    While open, calls are rejected without contacting the upstream. After
+    `reset_seconds` one probe call is let through (half-open); its success
+    closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_call(self, operation: str):
+        if self.opened_at is None:
+            return
+        remaining = self.opened_at + self.reset_seconds - time.monotonic()
+        if remaining > 0 or self._probing:
+            raise CircuitOpenError(operation, max(remaining, 1.0))
+        self._probing = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def record_abandoned(self):
+        """The call was cancelled before the upstream answered: no verdict, but let the next call probe."""
+        self._probing = False
+
+
+class LatencyWindow:
+    """Recent successful call durations, for choosing the hedging delay."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int) -> Optional[float]:
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection failures, rate limits and 5xx are worth retrying; other errors are not."""
+    # Deferred: openai is slow to import and already loaded by the time an upstream call fails
+    import openai
+
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    status = _status_code(error)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Server-requested delay from retry-after-ms / retry-after headers, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # HTTP-date form is not used by the API; fall back to backoff
+        return None
+    return None
+
+
+class UpstreamPolicy:
+    """
+    Timeout, retry, hedging and circuit breaking for one kind of upstream call.
+
+    Each attempt is bounded by `timeout`. Transient failures are retried up to
+    `max_attempts` in total with full-jitter exponential backoff, or after the
+    delay the server asks for in its rate-limit headers. With `hedge` set (only
+    for idempotent calls), an attempt still running after the recent p95 latency
+    gets a duplicate request and the first success wins.
+    """
+
+    def __init__(self, operation: str, timeout: float, max_attempts: int, hedge: bool = False):
+        self.operation = operation
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.hedge = hedge
+        self.breaker = CircuitBreaker(settings.UPSTREAM_CIRCUIT_FAILURE_THRESHOLD, settings.UPSTREAM_CIRCUIT_RESET_SECONDS)
+        self.latency = LatencyWindow()
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        requested = retry_after_seconds(error)
+        if requested is not None:
+            return min(requested, settings.UPSTREAM_RETRY_MAX_DELAY_SECONDS)
+        ceiling = min(settings.UPSTREAM_RETRY_MAX_DELAY_SECONDS, settings.UPSTREAM_RETRY_BASE_DELAY_SECONDS * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        start = time.perf_counter()
+        result = await asyncio.wait_for(fn(), self.timeout)
+        self.latency.add(time.perf_counter() - start)
+        return result
+
+    async def _hedged_attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        delay = self.latency.percentile(settings.UPSTREAM_HEDGE_PERCENTILE, settings.UPSTREAM_HEDGE_MIN_SAMPLES)
+        if not self.hedge or delay is None:
+            return await self._attempt(fn)
+
+        primary = asyncio.ensure_future(self._attempt(fn))
+        pending = {primary}
+        error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                pending = set()
+                return primary.result()
+
+            hedge = asyncio.ensure_future(self._attempt(fn))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        UPSTREAM_HEDGES.inc(operation=self.operation, winner="primary" if task is primary else "hedge")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+        """
+        Run `fn` (a zero-argument coroutine factory, called once per attempt) under
+        this policy. Pass hedge=False for calls that open a stream.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_call(self.operation)
+            try:
+                result = await (self._hedged_attempt(fn) if hedge else self._attempt(fn))
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered; a bad request says nothing about its health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt >= self.max_attempts or self.breaker.is_open:
+                    raise
+                UPSTREAM_RETRIES.inc(operation=self.operation)
+                await asyncio.sleep(self._backoff(attempt, e))
+                continue
+            except BaseException:
+                # Cancelled (client disconnect, sibling segment failed, ...); a half-open
+                # probe left marked in flight would keep the circuit open for good
+                self.breaker.record_abandoned()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "operation": self.operation,
+            "circuit_open": self.breaker.is_open,
+            "consecutive_failures": self.breaker.failures,
+            "hedge_delay": self.latency.percentile(settings.UPSTREAM_HEDGE_PERCENTILE, settings.UPSTREAM_HEDGE_MIN_SAMPLES)
+            if self.hedge else None,
+        }
+
+
+def upstream_http_error(error: BaseException, detail: str) -> Optional[HTTPException]:
+    """
+    Map upstream unavailability to a client-facing status with Retry-After:
+    open circuit or exhausted rate limit -> 503, timeout -> 504. Other errors -> None.
+    """
+    if isinstance(error, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail=f"{detail}: {error}",
+            headers={"Retry-After": str(int(error.retry_after + 0.999))}
+        )
+    if _status_code(error) == 429:
+        retry_after = retry_after_seconds(error) or settings.ADMISSION_RETRY_AFTER_SECONDS
+        return HTTPException(
+            status_code=503,
+            detail=f"{detail}: upstream rate limit reached",
+            headers={"Retry-After": str(int(retry_after + 0.999))}
+        )
+    import openai
+
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError)):
+        return HTTPException(status_code=504, detail=f"{detail}: upstream timed out")
+    return None
+
+
+_policies: List[UpstreamPolicy] = []
+
+
+def upstream_policy(operation: str, timeout: float, hedge: bool = False) -> UpstreamPolicy:
+    policy = UpstreamPolicy(operation, timeout, settings.UPSTREAM_MAX_ATTEMPTS, hedge=hedge and settings.UPSTREAM_HEDGE_ENABLED)
+    _policies.append(policy)
+    return policy
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    return [policy.stats() for policy in _policies]
+
+
+def _collect_circuits():
+    for policy in _policies:
+        CIRCUIT_OPEN.set(1 if policy.breaker.is_open else 0, operation=policy.operation)
+
+
+registry.add_collector(_collect_circuits)
+
+
+# Completions are idempotent from our side, so they may be hedged. Transcription
+# reads a shared upload file and speech writes cache files, so those are not.
+chat_policy = upstream_policy("chat", settings.CHAT_TIMEOUT_SECONDS, hedge=True)
+micro_goal_policy = upstream_policy("micro_goal", settings.MICRO_GOAL_TIMEOUT_SECONDS, hedge=True)
+stt_policy = upstream_policy("stt", settings.STT_TIMEOUT_SECONDS)
+tts_policy = upstream_policy("tts", settings.TTS_TIMEOUT_SECONDS)
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+class ServiceRegistry:
+    """
+    Services built on first use instead of at import.
+
+    Modules register a factory and export the returned proxy under the usual
+    singleton name, so call sites stay `speech_service.text_to_speech(...)`.
+    Nothing (OpenAI client, language profiles, ...) is constructed until a
+    request needs it or `warm_up` runs, which keeps worker start-up fast.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        # Warm-up builds services on a thread while requests may build them on the
+        # loop. Each service has its own build lock, so a request never waits for
+        # the warm-up to build services it does not use.
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> "LazyService":
+        self._factories[name] = factory
+        return LazyService(self, name)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._factories[name]()
+                with self._lock:
+                    self._instances[name] = instance
+        return instance
+
+    def built(self) -> List[str]:
+        return list(self._instances)
+
+    def build_all(self):
+        for name in list(self._factories):
+            self.get(name)
+
+    async def warm_up(self):
+        """Build every registered service off the event loop (imports and client setup block)."""
+        try:
+            await asyncio.to_thread(self.build_all)
+            logger.info("Services warmed up", extra={"services": self.built()})
+        except Exception:
+            # Services are still built on first use
+            logger.exception("Service warm-up failed")
+
+    def reset(self):
+        """Drop built instances (on shutdown, after their shared client is closed)."""
+        with self._lock:
+            self._instances.clear()
+
+
+class LazyService:
+    """Stand-in for a registered service; attribute access builds the real one on first use."""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self) -> str:
+        return f"<LazyService {self._name}>"
+
+
+services = ServiceRegistry()
+
+
+def lazy_service(name: str, factory: Callable[[], Any]) -> LazyService:
+    return services.register(name, factory)
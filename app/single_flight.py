@@ -0,0 +1,81 @@
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, TypeVar
+
+from app.metrics import SINGLE_FLIGHT_CALLS, SINGLE_FLIGHT_IN_FLIGHT, registry
+
+
+T = TypeVar("T")
+
+
+def make_key(*parts: Any) -> str:
+    """Stable key for a request from its parameters (model, messages, voice, ...)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: while a call for `key` is running, other
+    callers with the same key await its result instead of issuing their own.
+
+    The work runs in its own task, so a caller that disconnects does not cancel it
+    for the others still waiting.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            SINGLE_FLIGHT_CALLS.inc(group=self.name, role="leader")
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._finished(key, t))
+        else:
+            self.coalesced += 1
+            SINGLE_FLIGHT_CALLS.inc(group=self.name, role="coalesced")
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+
+_groups: List[SingleFlight] = []
+
+
+def single_flight_group(name: str) -> SingleFlight:
+    """Create a named coalescing group whose counters are included in all_stats()."""
+    group = SingleFlight(name)
+    _groups.append(group)
+    return group
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    return [group.stats() for group in _groups]
+
+
+def _collect_in_flight():
+    for group in _groups:
+        SINGLE_FLIGHT_IN_FLIGHT.set(len(group._inflight), group=group.name)
+
+
+registry.add_collector(_collect_in_flight)
@@ -0,0 +1,128 @@
+import re
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Words, or single punctuation/symbol characters
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Chat-format overhead per message and for priming the reply
+_MESSAGE_OVERHEAD = 4
+_REPLY_OVERHEAD = 2
+
+
+def _piece_tokens(piece: str) -> int:
+    chars_per_token = 4 if piece.isascii() else 2
+    return max(1, math.ceil(len(piece) / chars_per_token))
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in `text` without a network-backed tokenizer.
+
+    English words average ~4 characters per BPE token; non-ASCII scripts split
+    much finer, so they are counted at ~2 characters per token. The estimate is
+    deterministic and errs slightly high, which is what a budget needs.
+    """
+    if not text:
+        return 0
+    return sum(_piece_tokens(piece) for piece in _TOKEN_RE.findall(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimate prompt tokens for a list of chat messages."""
+    return sum(_MESSAGE_OVERHEAD + count_tokens(m.get("content") or "") for m in messages) + _REPLY_OVERHEAD
+
+
+def truncate_text(text: str, max_tokens: int, suffix: str = "...") -> str:
+    """Cut `text` at a word boundary so it fits in `max_tokens`."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    used = count_tokens(suffix)
+    end = 0
+    for match in _TOKEN_RE.finditer(text):
+        cost = _piece_tokens(match.group())
+        if used + cost > max_tokens:
+            break
+        used += cost
+        end = match.end()
+    return text[:end].rstrip() + suffix
+
+
+def _turn_tokens(turn: Dict[str, str]) -> int:
+    return 2 * _MESSAGE_OVERHEAD + count_tokens(turn["user_query"]) + count_tokens(turn["ai_response"])
+
+
+def fit_history(
+    turns: List[Dict[str, str]],
+    budget: int,
+    summary_budget: int = 0
+) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """
+    Keep the most recent conversation turns that fit in `budget` tokens.
+
+    Turns are {"user_query": ..., "ai_response": ...}, oldest first. Older turns
+    that do not fit are compacted into a short summary of what the user asked
+    (at most `summary_budget` tokens), returned alongside the kept turns.
+    """
+    kept: List[Dict[str, str]] = []
+    used = 0
+    index = len(turns)
+    for turn in reversed(turns):
+        cost = _turn_tokens(turn)
+        if used + cost > budget:
+            # Always keep the latest turn, trimming its answer if needed
+            if not kept:
+                room = max(budget - 2 * _MESSAGE_OVERHEAD - count_tokens(turn["user_query"]), 0)
+                kept.append({"user_query": turn["user_query"], "ai_response": truncate_text(turn["ai_response"], room)})
+                index -= 1
+            break
+        kept.append(turn)
+        used += cost
+        index -= 1
+    kept.reverse()
+
+    dropped = turns[:index]
+    summary = None
+    if dropped and summary_budget > 0:
+        topics = [truncate_text(" ".join(t["user_query"].split()), 20) for t in dropped]
+        summary = truncate_text(
+            "Earlier in this conversation the user asked about: " + "; ".join(topics),
+            summary_budget,
+        )
+    return kept, summary
+
+
+def _task_text(task: Any) -> str:
+    if isinstance(task, dict):
+        title = str(task.get("title") or "").strip()
+        goal = str(task.get("goal") or "").strip()
+        if title or goal:
+            return f"{title}: {goal}" if title and goal else title or goal
+        return ", ".join(str(v) for v in task.values() if v)
+    return str(task)
+
+
+def compact_tasks(tasks: Optional[List[Any]], budget: int) -> List[str]:
+    """
+    Deduplicate past tasks and keep the most recent ones that fit in `budget` tokens.
+
+    `tasks` is oldest first; each entry is reduced to "title: goal" and exact
+    duplicates (ignoring case and spacing) are dropped. Result is oldest first.
+    """
+    compacted: List[str] = []
+    seen = set()
+    used = 0
+    for task in reversed(tasks or []):
+        text = " ".join(_task_text(task).split())
+        key = text.lower()
+        if not text or key in seen:
+            continue
+        cost = count_tokens(text) + 1
+        if used + cost > budget:
+            break
+        seen.add(key)
+        compacted.append(text)
+        used += cost
+    compacted.reverse()
+    return compacted
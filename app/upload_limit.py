@@ -0,0 +1,78 @@
+from typing import Iterable
+
+from starlette.responses import JSONResponse
+
+
+class _UploadTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject request bodies larger than `max_bytes` while they are still streaming in.
+
+    A declared Content-Length over the limit is rejected before any body is read;
+    otherwise bytes are counted as they arrive and the request is aborted with
+    413 as soon as the limit is crossed, so oversized uploads are never fully
+    buffered or spooled to disk.
+    """
+
+    def __init__(self, app, max_bytes: int, path_prefixes: Iterable[str] = ("/",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > self.max_bytes:
+                    await self._reject(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise _UploadTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Drop whatever error response the app produced; we answer with 413 below
+            if exceeded:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _UploadTooLarge:
+            pass
+
+        if exceeded and not response_started:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        limit_mb = self.max_bytes / (1024 * 1024)
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload too large. Maximum allowed size is {limit_mb:g} MB."}
+        )
+        await response(scope, receive, send)
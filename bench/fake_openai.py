@@ -0,0 +1,203 @@
+"""
+Local stand-in for the parts of the OpenAI API this app uses, for benchmarks.
+
+Emulates:
+  POST /v1/chat/completions      plain, streamed (SSE) and json_schema responses
+  POST /v1/audio/speech          chunked audio body
+  POST /v1/audio/transcriptions  multipart upload, text or json response
+
+Latency, jitter and error rate come from environment variables:
+  FAKE_OPENAI_LATENCY_MS      base latency before a response starts (default 300)
+  FAKE_OPENAI_JITTER_MS       uniform random extra latency (default 100)
+  FAKE_OPENAI_ERROR_RATE      fraction of requests answered with an error (default 0)
+  FAKE_OPENAI_ERROR_STATUS    status code for injected errors (default 500)
+  FAKE_OPENAI_TOKEN_DELAY_MS  delay between streamed chunks (default 10)
+
+Run it, then point the app at it:
+  uvicorn bench.fake_openai:app --port 9000
+  OPENAI_API_BASE=http://127.0.0.1:9000/v1 OPENAI_API_KEY=fake uvicorn app.main:app --port 8000
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+
+LATENCY_MS = float(os.getenv("FAKE_OPENAI_LATENCY_MS", "300"))
+JITTER_MS = float(os.getenv("FAKE_OPENAI_JITTER_MS", "100"))
+ERROR_RATE = float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0"))
+ERROR_STATUS = int(os.getenv("FAKE_OPENAI_ERROR_STATUS", "500"))
+TOKEN_DELAY_MS = float(os.getenv("FAKE_OPENAI_TOKEN_DELAY_MS", "10"))
+
+CHAT_REPLY = (
+    "That is a great question. Start with a small step today and build on it tomorrow. "
+    "Consistency matters more than intensity, so pick something you can repeat every day."
+)
+
+# A valid MPEG-1 Layer III frame header (128 kbps, 44.1 kHz) followed by silence
+_MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+_VERBS = ["Write", "Plan", "Walk", "Read", "Sketch", "Stretch", "Review", "Practice", "Call", "Cook", "Organize", "Listen"]
+_OBJECTS = ["journal page", "budget", "neighborhood loop", "short story", "mind map", "morning routine",
+            "flashcards", "guitar chords", "old friend", "new recipe", "desk drawer", "podcast episode"]
+
+app = FastAPI(title="Fake OpenAI")
+
+
+async def _delay():
+    await asyncio.sleep((LATENCY_MS + random.uniform(0, JITTER_MS)) / 1000)
+
+
+def _injected_error():
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        return JSONResponse(
+            status_code=ERROR_STATUS,
+            content={"error": {"message": "Injected failure", "type": "server_error", "code": None}},
+            headers={"retry-after": "1"} if ERROR_STATUS == 429 else None,
+        )
+    return None
+
+
+def _usage(prompt: str, completion: str) -> Dict[str, int]:
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(completion) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _plan_json(schema: Dict[str, Any]) -> str:
+    """Produce an object that satisfies the micro goal schemas, with distinct entries."""
+    plan_props = schema.get("properties", {})
+    item_props = plan_props.get("day_plan", {}).get("items", {}).get("properties", {})
+    categories = item_props.get("category", {}).get("enum") or ["mind"]
+    count = 5 if "big_goal" in plan_props else 2
+    entries = []
+    for _ in range(count):
+        verb, obj = random.choice(_VERBS), random.choice(_OBJECTS)
+        tag = uuid.uuid4().hex[:8]
+        entries.append({
+            "category": random.choice(categories),
+            "title": f"{verb} {obj} {tag}",
+            "goal": f"{verb} the {obj} for {random.randint(5, 60)} minutes ({tag})",
+        })
+    result: Dict[str, Any] = {"day_plan": entries}
+    if "big_goal" in plan_props:
+        result["big_goal"] = "Benchmark goal"
+    return json.dumps(result)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await _delay()
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        content = _plan_json(response_format["json_schema"].get("schema", {}))
+    else:
+        content = CHAT_REPLY
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "fake")
+
+    if body.get("stream"):
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        async def events():
+            words = content.split(" ")
+            for index, word in enumerate(words):
+                delta = word if index == len(words) - 1 else word + " "
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(TOKEN_DELAY_MS / 1000)
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            if include_usage:
+                usage = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [], "usage": _usage(prompt, content),
+                }
+                yield f"data: {json.dumps(usage)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content, "refusal": None},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(prompt, content),
+    }
+
+
+@app.post("/v1/audio/speech")
+async def speech(request: Request):
+    body = await request.json()
+    await _delay()
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    # About 100 bytes of audio per input character, sent frame by frame
+    frames = max(4, len(body.get("input", "")) // 4)
+
+    async def audio():
+        for index in range(frames):
+            yield _MP3_FRAME
+            if index % 8 == 7:
+                await asyncio.sleep(TOKEN_DELAY_MS / 1000)
+
+    return StreamingResponse(audio(), media_type="audio/mpeg")
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    form = await request.form()
+    upload = form.get("file")
+    size = len(await upload.read()) if upload is not None else 0
+    await _delay()
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    text = f"This is a fake transcription of {size} bytes of audio."
+    if form.get("response_format", "json") == "text":
+        return PlainTextResponse(text)
+    return {"text": text}
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,196 @@
+"""
+Drive the API endpoints at a fixed concurrency and report throughput and latency percentiles.
+
+Start the fake OpenAI server and the app (see bench/fake_openai.py), then:
+  python -m bench.run_benchmark --base-url http://127.0.0.1:8000 --concurrency 32 --requests 500
+
+Each endpoint is benchmarked in turn. While it runs, a probe requests `/` every
+50 ms: `/` does no work, so a high probe p99 means something is blocking the
+event loop.
+"""
+import io
+import math
+import time
+import json
+import wave
+import asyncio
+import argparse
+import itertools
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+
+ENDPOINTS = ["chat", "micro_goal", "voice_to_text", "text_to_speech"]
+
+PROBE_INTERVAL_SECONDS = 0.05
+
+
+def _silent_wav(seconds: float = 2.0, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(name: str, latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "endpoint": name,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+    }
+
+
+class Workload:
+    """Builds one request per call. Inputs vary by counter so caches and coalescing do not hide upstream cost."""
+
+    def __init__(self, unique: bool):
+        self.unique = unique
+        self.counter = itertools.count()
+        self.wav = _silent_wav()
+
+    def _n(self) -> int:
+        return next(self.counter) if self.unique else 0
+
+    def request(self, client: httpx.AsyncClient, endpoint: str) -> Awaitable[httpx.Response]:
+        n = self._n()
+        if endpoint == "chat":
+            return client.post("/api/chat/chat-text", json={
+                "user_query": f"How can I build a better study habit? (variant {n})",
+                "user_age": 21,
+            })
+        if endpoint == "micro_goal":
+            return client.post("/api/microgoals/micro_goal", json={
+                "big_goal": f"Run a half marathon (variant {n})",
+                "age": 28,
+                "userdata": "body, mind",
+                "tasks": [],
+            })
+        if endpoint == "voice_to_text":
+            return client.post(
+                "/api/voice/voice-to-text",
+                files={"audio": (f"sample_{n}.wav", self.wav, "audio/wav")},
+            )
+        if endpoint == "text_to_speech":
+            return client.post("/api/voice/text-to-speech", json={
+                "text": f"Great job today. Remember to drink water and take a short walk. Number {n}.",
+                "gender": "female",
+            })
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+async def _probe(client: httpx.AsyncClient, latencies: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get("/")
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    workload: Workload,
+    concurrency: int,
+    total_requests: int,
+    on_error: Optional[Callable[[str], None]] = None
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    probe_latencies: List[float] = []
+    errors = 0
+    remaining = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while next(remaining) < total_requests:
+            start = time.perf_counter()
+            try:
+                response = await workload.request(client, endpoint)
+                if response.status_code >= 400:
+                    errors += 1
+                    if on_error:
+                        on_error(f"{endpoint}: HTTP {response.status_code} {response.text[:200]}")
+                    continue
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError as e:
+                errors += 1
+                if on_error:
+                    on_error(f"{endpoint}: {type(e).__name__} {e}")
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(client, probe_latencies, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    result = summarize(endpoint, latencies, errors, elapsed)
+    probe_ordered = sorted(probe_latencies)
+    result["probe_p99_ms"] = round(percentile(probe_ordered, 99) * 1000, 1)
+    return result
+
+
+def print_table(results: List[Dict[str, Any]]):
+    columns = ["endpoint", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "probe_p99_ms"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in results:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+async def main(args: argparse.Namespace):
+    endpoints = args.endpoints or ENDPOINTS
+    workload = Workload(unique=not args.repeat_inputs)
+    limits = httpx.Limits(max_connections=args.concurrency + 1, max_keepalive_connections=args.concurrency + 1)
+    errors_seen: List[str] = []
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        results = []
+        for endpoint in endpoints:
+            # A few sequential requests first, so connection setup is not measured
+            for _ in range(min(3, args.requests)):
+                await workload.request(client, endpoint)
+            results.append(await run_endpoint(
+                client, endpoint, workload, args.concurrency, args.requests, on_error=errors_seen.append
+            ))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+    for message in errors_seen[:5]:
+        print(f"[error] {message}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the voice assistant API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--endpoints", nargs="*", choices=ENDPOINTS, help="Subset of endpoints to run")
+    parser.add_argument("--repeat-inputs", action="store_true",
+                        help="Send identical inputs, to measure cache and coalescing hits instead of upstream cost")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    asyncio.run(main(parser.parse_args()))
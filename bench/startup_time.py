@@ -0,0 +1,90 @@
+"""
+Measure how long a fresh worker takes to become ready, and fail if it is over budget.
+
+Each run is a new interpreter, as for a freshly started uvicorn worker:
+  import   `import app.main` (modules, settings, routers)
+  startup  the lifespan up to the point the app accepts requests
+  warmup   building every lazy service (OpenAI client, ...), which runs in the
+           background after startup and is reported but not budgeted
+
+  python -m bench.startup_time --runs 5 --import-budget-ms 800 --startup-budget-ms 200
+
+Exits with status 1 when the median import or startup time exceeds its budget,
+so it can gate CI. `python -X importtime -c "import app.main"` shows where the
+time goes when it does.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+from typing import Dict, List
+
+# Runs in the child interpreter; prints one JSON line of timings in milliseconds
+_CHILD = r"""
+import sys, time, json, asyncio
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+from app.main import app as application
+from app.config import settings
+from app.audio_store import audio_store
+from app.services import services
+
+settings.TEMP_DIR = sys.argv[1]
+settings.AUDIO_RESPONSE_PATH = audio_store.directory = sys.argv[2]
+settings.SERVICE_WARMUP_ON_STARTUP = False
+
+async def main():
+    t0 = time.perf_counter()
+    async with application.router.lifespan_context(application):
+        ready = time.perf_counter()
+        await services.warm_up()
+        warm = time.perf_counter()
+    return (ready - t0) * 1000, (warm - ready) * 1000
+
+startup_ms, warmup_ms = asyncio.run(main())
+print(json.dumps({"import_ms": (imported - start) * 1000, "startup_ms": startup_ms, "warmup_ms": warmup_ms}))
+"""
+
+
+def measure_once() -> Dict[str, float]:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "startup-benchmark")
+    with tempfile.TemporaryDirectory() as tmp:
+        temp_dir, audio_dir = os.path.join(tmp, "temp"), os.path.join(tmp, "audio")
+        result = subprocess.run(
+            [sys.executable, "-c", _CHILD, temp_dir, audio_dir],
+            capture_output=True, text=True, env=env, check=True
+        )
+    # The app logs to stdout too; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(args: argparse.Namespace) -> int:
+    runs: List[Dict[str, float]] = [measure_once() for _ in range(args.runs)]
+    medians = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+    budgets = {"import_ms": args.import_budget_ms, "startup_ms": args.startup_budget_ms}
+
+    if args.json:
+        print(json.dumps({"runs": len(runs), "median": medians, "budget": budgets}, indent=2))
+    else:
+        for key, value in medians.items():
+            budget = budgets.get(key)
+            verdict = "" if budget is None else ("  ok" if value <= budget else f"  OVER BUDGET ({budget} ms)")
+            print(f"{key:<11} {value:>8.1f}{verdict}")
+
+    over = [key for key, budget in budgets.items() if medians[key] > budget]
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure worker import and startup time against a budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=800.0)
+    parser.add_argument("--startup-budget-ms", type=float, default=200.0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.admission import AdmissionLimiter, AdmittedStreamingResponse
+
+
+def _limiter(max_concurrent: int = 1, max_queue: int = 1, queue_timeout: float = 5.0) -> AdmissionLimiter:
+    return AdmissionLimiter("test", max_concurrent, max_queue, queue_timeout, retry_after=2)
+
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        limiter = _limiter()
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as rejected:
+            await limiter.acquire()
+        limiter.release()
+        await waiter
+        return limiter, rejected.value
+
+    limiter, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "2"
+    assert limiter.active == 1
+
+
+def test_queue_timeout_is_rejected_with_503():
+    async def scenario():
+        limiter = _limiter(queue_timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(HTTPException) as rejected:
+            await limiter.acquire()
+        return limiter, rejected.value
+
+    limiter, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert limiter.active == 1
+    assert limiter.stats()["queued"] == 0
+
+
+def test_release_hands_slot_to_oldest_waiter():
+    async def scenario():
+        limiter = _limiter(max_queue=2)
+        await limiter.acquire()
+        first = asyncio.ensure_future(limiter.acquire())
+        second = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release()
+        await first
+        assert not second.done()
+        limiter.release()
+        await second
+        limiter.release()
+        return limiter
+
+    assert asyncio.run(scenario()).active == 0
+
+
+def _stream_response(limiter: AdmissionLimiter, started: list, closed: list):
+    async def body():
+        started.append(True)
+        yield b"data"
+
+    async def on_close():
+        closed.append(True)
+
+    return AdmittedStreamingResponse(limiter, body(), on_close=on_close, media_type="text/plain")
+
+
+def test_stream_slot_released_when_client_disconnects_before_body():
+    async def scenario():
+        limiter = _limiter()
+        started, closed = [], []
+        await limiter.acquire()
+        response = _stream_response(limiter, started, closed)
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            await asyncio.sleep(1)
+
+        await response({"type": "http", "asgi": {"spec_version": "2.0"}}, receive, send)
+        return limiter, started, closed
+
+    limiter, started, closed = asyncio.run(scenario())
+    assert not started
+    assert closed
+    assert limiter.active == 0
+
+
+def test_stream_slot_released_when_send_fails():
+    async def scenario():
+        limiter = _limiter()
+        await limiter.acquire()
+        response = _stream_response(limiter, [], [])
+
+        async def receive():
+            await asyncio.sleep(60)
+
+        async def send(message):
+            raise OSError("connection reset")
+
+        with pytest.raises(Exception):
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+        return limiter
+
+    assert asyncio.run(scenario()).active == 0
+
+
+def test_stream_slot_released_after_full_response():
+    async def scenario():
+        limiter = _limiter()
+        started, sent = [], []
+        await limiter.acquire()
+        response = _stream_response(limiter, started, [])
+
+        async def receive():
+            await asyncio.sleep(60)
+
+        async def send(message):
+            sent.append(message)
+
+        await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+        return limiter, started, sent
+
+    limiter, started, sent = asyncio.run(scenario())
+    assert started
+    assert sent[-1]["more_body"] is False
+    assert limiter.active == 0
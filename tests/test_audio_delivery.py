@@ -0,0 +1,23 @@
+import os
+
+from app.audio_delivery import etag_for
+from app.audio_store import AudioStore
+
+
+def test_etag_survives_uses_and_changes_when_bytes_are_rewritten(tmp_path):
+    store = AudioStore(str(tmp_path), 100.0, 10 ** 6, 100, interval_seconds=60)
+    name = "tts_" + "0" * 64 + ".mp3"
+    path = store.path_for(name)
+    with open(path, "wb") as f:
+        f.write(b"first synthesis")
+    os.utime(path, (1, 1))
+    store.register(name)
+    etag = etag_for(os.stat(path))
+
+    assert store.touch(name)
+    assert etag_for(os.stat(path)) == etag
+
+    # Evicted and synthesized again under the same (request-derived) name
+    with open(path, "wb") as f:
+        f.write(b"second synthesis")
+    assert etag_for(os.stat(path)) != etag
@@ -0,0 +1,77 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from app.Voice_assistant import audio_preprocess
+from app.config import settings
+
+
+def _wav(seconds: float, rate: int = 48000, channels: int = 2) -> io.BytesIO:
+    frames = int(seconds * rate)
+    t = np.arange(frames) / rate
+    tone = (np.sin(2 * np.pi * 440 * t) * 8000).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(tone, channels).tobytes())
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture(autouse=True)
+def numpy_loaded():
+    assert audio_preprocess.numpy_available()
+
+
+def test_decodes_in_blocks_to_mono_target_rate(monkeypatch):
+    monkeypatch.setattr(audio_preprocess, "DECODE_BLOCK_SECONDS", 1)
+    decoded = audio_preprocess.decode_wav(_wav(3.5))
+    blocks = list(decoded.blocks)
+    assert [len(block) for block in blocks] == [48000, 48000, 48000, 24000]
+    assert blocks[0].shape[1] == 2
+
+    samples = audio_preprocess.load_pcm(_wav(3.5), audio_preprocess.decode_wav)
+    assert samples.dtype == np.float32
+    assert abs(len(samples) - 3.5 * settings.AUDIO_TARGET_SAMPLE_RATE) <= 4
+
+
+def test_duration_cap_raises_before_decoding(monkeypatch):
+    monkeypatch.setattr(settings, "STT_MAX_AUDIO_SECONDS", 2)
+    decoded = audio_preprocess.decode_wav(_wav(3))
+    calls = []
+    blocks = decoded.blocks
+
+    def decoder(file_obj):
+        def counted():
+            for block in blocks:
+                calls.append(len(block))
+                yield block
+        return decoded._replace(blocks=counted())
+
+    with pytest.raises(audio_preprocess.AudioTooLongError):
+        audio_preprocess.load_pcm(io.BytesIO(), decoder)
+    assert calls == []
+
+
+def test_duration_cap_applies_while_decoding_when_length_is_unknown(monkeypatch):
+    monkeypatch.setattr(settings, "STT_MAX_AUDIO_SECONDS", 2)
+    monkeypatch.setattr(audio_preprocess, "DECODE_BLOCK_SECONDS", 1)
+    calls = []
+
+    def decoder(file_obj):
+        decoded = audio_preprocess.decode_wav(file_obj)
+
+        def counted():
+            for block in decoded.blocks:
+                calls.append(len(block))
+                yield block
+        return decoded._replace(frames=None, blocks=counted())
+
+    with pytest.raises(audio_preprocess.AudioTooLongError):
+        audio_preprocess.load_pcm(_wav(10), decoder)
+    # Stopped at the first block past the cap, not after decoding everything
+    assert len(calls) == 3
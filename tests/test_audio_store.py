@@ -0,0 +1,101 @@
+import os
+import time
+
+from app.audio_store import AudioStore
+
+
+def _store(directory, ttl_seconds: float = 100.0, max_bytes: int = 10 ** 6, max_files: int = 100) -> AudioStore:
+    store = AudioStore(str(directory), ttl_seconds, max_bytes, max_files, interval_seconds=60)
+    store.leader = True
+    return store
+
+
+def _write(store: AudioStore, name: str, size: int = 10):
+    with open(store.path_for(name), "wb") as f:
+        f.write(b"x" * size)
+    store.register(name)
+
+
+def test_files_expire_ttl_after_last_use(tmp_path, monkeypatch):
+    clock = [time.time()]
+    monkeypatch.setattr("app.audio_store.time.time", lambda: clock[0])
+    store = _store(tmp_path)
+    _write(store, "a.mp3")
+    _write(store, "b.mp3")
+
+    # A hit near the end of a.mp3's TTL gives it a full TTL again
+    clock[0] += 99
+    assert store.touch("a.mp3")
+    assert store.evict_expired(clock[0] + 50) == 1
+    assert os.path.exists(store.path_for("a.mp3"))
+    assert not os.path.exists(store.path_for("b.mp3"))
+
+    assert store.evict_expired(clock[0] + 101) == 1
+    assert not os.path.exists(store.path_for("a.mp3"))
+
+
+def test_touch_records_use_as_atime_and_keeps_mtime(tmp_path):
+    store = _store(tmp_path)
+    _write(store, "a.mp3")
+    os.utime(store.path_for("a.mp3"), (1, 1))
+
+    assert store.touch("a.mp3")
+    assert os.path.getatime(store.path_for("a.mp3")) > time.time() - 5
+    # mtime marks the content version, which the audio ETag is built on
+    assert os.path.getmtime(store.path_for("a.mp3")) == 1
+
+    rebuilt = _store(tmp_path)
+    rebuilt.rebuild()
+    assert "a.mp3" in rebuilt._files
+
+
+def test_touch_of_deleted_file_is_a_miss(tmp_path):
+    store = _store(tmp_path)
+    _write(store, "a.mp3", size=10)
+    os.remove(store.path_for("a.mp3"))
+
+    assert not store.touch("a.mp3")
+    assert store.stats()["files"] == 0
+    assert store.stats()["bytes"] == 0
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    store = _store(tmp_path, max_files=2)
+    _write(store, "a.mp3")
+    _write(store, "b.mp3")
+    store.touch("a.mp3")
+    _write(store, "c.mp3")
+
+    assert sorted(store._files) == ["a.mp3", "c.mp3"]
+    assert store.evicted == 1
+
+
+def test_shared_leader_adopts_files_without_losing_recency(tmp_path):
+    leader = _store(tmp_path, max_files=3)
+    leader.shared = True
+    other = _store(tmp_path, max_files=3)
+    other.shared = True
+    other.leader = False
+
+    _write(leader, "a.mp3")
+    _write(leader, "b.mp3")
+    leader.touch("a.mp3")
+    _write(other, "c.mp3")
+    leader._merge(leader._scan(), time.time())
+    assert list(leader._lru) == ["b.mp3", "a.mp3", "c.mp3"]
+
+    # A use recorded by the other worker (as mtime) protects b.mp3 from eviction
+    other.register("b.mp3")
+    assert other.touch("b.mp3")
+    _write(leader, "d.mp3")
+    assert sorted(os.listdir(tmp_path)) == ["b.mp3", "c.mp3", "d.mp3"]
+
+
+def test_non_leader_enforces_quota_on_its_own_files(tmp_path):
+    store = _store(tmp_path, max_files=1)
+    store.shared = True
+    store.leader = False
+    _write(store, "a.mp3")
+    _write(store, "b.mp3")
+
+    assert os.listdir(tmp_path) == ["b.mp3"]
@@ -0,0 +1,42 @@
+import asyncio
+
+import app.chat.fast_path  # noqa: F401  (registers the fast path's phrases as known texts)
+from app.language import _KNOWN, UNDETERMINED, LanguageIdentifier, normalize, script_language
+
+
+def test_single_language_scripts_are_identified_without_detection():
+    assert script_language("안녕하세요")[0] == "ko"
+    assert script_language("こんにちは、世界")[0] == "ja"
+    assert script_language("你好")[0] == "zh"
+
+
+def test_short_text_in_shared_scripts_is_undetermined():
+    identifier = LanguageIdentifier()
+    # Arabic, Persian and Urdu share a script; none of them should be guessed
+    for text in ["شكرا جزيلا", "خوش آمدید", "آپ کیسے ہیں؟", "Спасибо"]:
+        assert identifier.detect(text) == UNDETERMINED
+
+
+def test_detection_is_memoized():
+    identifier = LanguageIdentifier()
+    identifier.detect("감사합니다")
+    identifier.detect("감사합니다!")
+
+    assert identifier.hits == 1
+    assert identifier.misses == 1
+
+
+def test_fast_path_phrases_are_known_texts():
+    identifier = LanguageIdentifier()
+    for text, language in [("नमस्ते", "hi"), ("Adiós!", "es"), ("здравствуйте", "ru"), ("こんばんは", "ja")]:
+        assert normalize(text) in _KNOWN
+        assert identifier.detect(text) == language
+
+
+def test_sync_and_async_detection_count_lookups_alike():
+    sync, async_ = LanguageIdentifier(), LanguageIdentifier()
+    for _ in range(2):
+        sync.detect("감사합니다")
+        asyncio.run(async_.detect_async("감사합니다"))
+
+    assert (sync.hits, sync.misses) == (async_.hits, async_.misses) == (1, 1)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.micro_goals.llm_service import Micro_goal, REPAIR_TOKENS_PER_ENTRY
+from app.micro_goals.task_index import PastTaskIndex
+from app.single_flight import SingleFlight
+
+TASKS = [
+    ("body", "Morning jog", "Run two kilometres before breakfast"),
+    ("mind", "Read a chapter", "Finish one chapter of a non-fiction book"),
+    ("soul", "Gratitude journal", "Write down three things you are thankful for"),
+    ("purpose", "Update resume", "Add your latest project to your CV"),
+    ("body", "Stretch break", "Do ten minutes of yoga at lunchtime"),
+    ("mind", "Learn ten words", "Practise Spanish vocabulary with flashcards"),
+    ("purpose", "Network message", "Send a note to a former colleague"),
+]
+
+
+def _entries(*indexes, **overrides):
+    return [dict(dict(zip(("category", "title", "goal"), TASKS[i])), **overrides) for i in indexes]
+
+
+class _Completions:
+    """Stands in for client.chat.completions, replaying canned message contents."""
+
+    def __init__(self, contents):
+        self.contents = list(contents)
+        self.requests = []
+
+    async def create(self, **request):
+        self.requests.append(request)
+        content = self.contents.pop(0)
+        message = SimpleNamespace(content=content, refusal=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def _service(contents) -> Micro_goal:
+    service = Micro_goal.__new__(Micro_goal)
+    completions = _Completions(contents)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    service.task_index = PastTaskIndex(10, 100, settings.MICRO_GOAL_SIMILARITY_THRESHOLD)
+    service.inflight = SingleFlight("test")
+    return service
+
+
+def _plan(service: Micro_goal):
+    messages = [{"role": "user", "content": "plan my day"}]
+    return asyncio.run(service.get_ai_response(messages, ["mind", "body", "soul", "purpose"], "Get fit"))
+
+
+def test_truncated_first_response_is_regenerated():
+    service = _service([
+        '{"big_goal": "Get fit", "day_plan": [{"category": "body", "title": "Morn',
+        json.dumps({"day_plan": _entries(0, 1, 2, 3, 4)}),
+    ])
+    plan = _plan(service)
+
+    assert [entry.title for entry in plan.day_plan] == [task[1] for task in TASKS[:5]]
+    requests = service.client.chat.completions.requests
+    assert len(requests) == 2
+    assert requests[1]["max_tokens"] == REPAIR_TOKENS_PER_ENTRY * 5
+    assert requests[1]["response_format"]["json_schema"]["name"] == "day_plan_entries"
+
+
+def test_only_invalid_entries_are_regenerated():
+    first = _entries(0, 1, 2) + _entries(3, category="career") + _entries(4, title="")
+    service = _service([
+        json.dumps({"big_goal": "Get fit", "day_plan": first}),
+        json.dumps({"day_plan": _entries(5, 6)}),
+    ])
+    plan = _plan(service)
+
+    assert [entry.title for entry in plan.day_plan] == [TASKS[i][1] for i in (0, 1, 2, 5, 6)]
+    repair = service.client.chat.completions.requests[1]
+    assert repair["max_tokens"] == REPAIR_TOKENS_PER_ENTRY * 2
+    # The accepted entries are echoed back so the model does not repeat them
+    assert "Morning jog" in repair["messages"][-1]["content"]
+
+
+def test_still_invalid_after_last_repair_attempt_is_an_error():
+    # The original and every repair repeat the same two entries
+    contents = [json.dumps({"big_goal": "Get fit", "day_plan": _entries(0, 1, 0, 1)})]
+    contents += [json.dumps({"day_plan": _entries(0, 1)})] * settings.MICRO_GOAL_REPAIR_ATTEMPTS
+    service = _service(contents)
+
+    with pytest.raises(HTTPException) as raised:
+        _plan(service)
+    assert raised.value.status_code == 500
+    assert "Only 2 of 5" in raised.value.detail
+    assert len(service.client.chat.completions.requests) == 1 + settings.MICRO_GOAL_REPAIR_ATTEMPTS
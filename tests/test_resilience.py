@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from app.resilience import CircuitBreaker, CircuitOpenError, UpstreamPolicy
+
+
+class Unavailable(Exception):
+    status_code = 503
+
+
+def _policy(max_attempts: int = 1) -> UpstreamPolicy:
+    policy = UpstreamPolicy("test", timeout=5.0, max_attempts=max_attempts)
+    policy.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60.0)
+    return policy
+
+
+async def _fail():
+    raise Unavailable()
+
+
+async def _ok():
+    return "ok"
+
+
+def _open_then_half_open(policy: UpstreamPolicy):
+    async def trip():
+        for _ in range(policy.breaker.failure_threshold):
+            with pytest.raises(Unavailable):
+                await policy.call(_fail)
+
+    asyncio.run(trip())
+    assert policy.breaker.is_open
+    # Pretend the reset period has passed
+    policy.breaker.opened_at -= policy.breaker.reset_seconds
+
+
+def test_breaker_opens_after_consecutive_failures():
+    policy = _policy()
+    _open_then_half_open(policy)
+    policy.breaker.opened_at += policy.breaker.reset_seconds
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(policy.call(_ok))
+
+
+def test_half_open_probe_success_closes_circuit():
+    policy = _policy()
+    _open_then_half_open(policy)
+
+    assert asyncio.run(policy.call(_ok)) == "ok"
+    assert not policy.breaker.is_open
+
+
+def test_half_open_probe_failure_reopens_circuit():
+    policy = _policy()
+    _open_then_half_open(policy)
+
+    with pytest.raises(Unavailable):
+        asyncio.run(policy.call(_fail))
+    assert policy.breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(policy.call(_ok))
+
+
+def test_cancelled_half_open_probe_lets_next_call_probe():
+    policy = _policy()
+    _open_then_half_open(policy)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(60)
+
+        probe = asyncio.ensure_future(policy.call(slow))
+        await started.wait()
+        # A second call while the probe is in flight is still rejected
+        with pytest.raises(CircuitOpenError):
+            await policy.call(_ok)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await policy.call(_ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert not policy.breaker.is_open
+
+
+def test_bad_request_does_not_count_as_failure():
+    policy = _policy()
+
+    async def bad_request():
+        raise ValueError("bad input")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            asyncio.run(policy.call(bad_request))
+    assert not policy.breaker.is_open
+    assert policy.breaker.failures == 0
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from app.services import ServiceRegistry
+
+
+def test_service_is_built_once_on_first_use():
+    registry = ServiceRegistry()
+    builds = []
+    proxy = registry.register("greeter", lambda: builds.append(1) or type("Greeter", (), {"hello": "hi"})())
+
+    assert registry.built() == []
+    assert proxy.hello == "hi"
+    assert proxy.hello == "hi"
+    assert len(builds) == 1
+
+
+def test_building_one_service_does_not_block_another():
+    registry = ServiceRegistry()
+    slow_started = threading.Event()
+    release_slow = threading.Event()
+
+    def slow_factory():
+        slow_started.set()
+        release_slow.wait(5)
+        return object()
+
+    registry.register("slow", slow_factory)
+    fast = registry.register("fast", lambda: type("Fast", (), {"ready": True})())
+
+    warm_up = threading.Thread(target=registry.get, args=("slow",))
+    warm_up.start()
+    assert slow_started.wait(5)
+    start = time.perf_counter()
+    assert fast.ready
+    elapsed = time.perf_counter() - start
+    release_slow.set()
+    warm_up.join()
+
+    assert elapsed < 1
+    assert sorted(registry.built()) == ["fast", "slow"]
+
+
+def test_concurrent_gets_share_one_instance():
+    registry = ServiceRegistry()
+    registry.register("shared", lambda: time.sleep(0.05) or object())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("shared"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(instance) for instance in results}) == 1
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+from app.chat import chat_router
+from app.chat.session_store import SessionStore
+from app.services import services
+
+
+def test_persistent_history_survives_restart_until_cleared(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    store = SessionStore(10, 3600, 3, db_path=db_path)
+    for i in range(5):
+        store.append("u1", f"q{i}", f"a{i}")
+
+    restarted = SessionStore(10, 3600, 3, db_path=db_path)
+    assert [turn["user_query"] for turn in restarted.get_history("u1")] == ["q2", "q3", "q4"]
+
+    restarted.clear("u1")
+    assert SessionStore(10, 3600, 3, db_path=db_path).get_history("u1") == []
+
+
+def test_clear_endpoint_deletes_off_the_loop_without_building_the_chat_service(tmp_path, monkeypatch):
+    store = SessionStore(10, 3600, 3, db_path=str(tmp_path / "sessions.db"))
+    store.append("u1", "hello", "hi")
+    threads = []
+    clear = store.clear
+
+    def recording_clear(user_id):
+        threads.append(threading.current_thread())
+        clear(user_id)
+
+    monkeypatch.setattr(store, "clear", recording_clear)
+    monkeypatch.setattr(chat_router, "session_store", store)
+
+    result = asyncio.run(chat_router.clear_chat_session("u1"))
+
+    assert result == {"user_id": "u1", "cleared": True}
+    assert store.get_history("u1") == []
+    assert threads and threads[0] is not threading.main_thread()
+    assert "chat_llm" not in services.built()
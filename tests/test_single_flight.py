@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.single_flight import SingleFlight
+
+
+def test_identical_calls_share_one_execution():
+    async def scenario():
+        group = SingleFlight("test")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(group.do("key", work) for _ in range(5)))
+        return group, calls, results
+
+    group, calls, results = asyncio.run(scenario())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert (group.leaders, group.coalesced) == (1, 4)
+    assert group.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        group = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        async def ok():
+            return "ok"
+
+        results = await asyncio.gather(group.do("key", fail), group.do("key", fail), return_exceptions=True)
+        later = await group.do("key", ok)
+        return results, later
+
+    results, later = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert later == "ok"
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    async def scenario():
+        group = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "result"
+
+        first = asyncio.ensure_future(group.do("key", work))
+        second = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "result"
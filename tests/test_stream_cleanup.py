@@ -0,0 +1,76 @@
+import asyncio
+
+from app.admission import AdmissionLimiter, AdmittedStreamingResponse, primed
+from app.chat.llm_service import ChatLLMService
+from app.config import settings
+from app.Voice_assistant.speech_service import SpeechService
+
+
+class _Upstream:
+    """Stands in for an open upstream stream; records whether it was closed."""
+
+    def __init__(self):
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+    async def close(self):
+        self.closed = True
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    async def iter_bytes(self, size):
+        yield b"audio"
+
+
+async def _disconnect_before_body(response: AdmittedStreamingResponse):
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        await asyncio.sleep(1)
+
+    await response({"type": "http", "asgi": {"spec_version": "2.0"}}, receive, send)
+
+
+def test_chat_upstream_closed_when_client_disconnects_before_body():
+    async def scenario():
+        limiter = AdmissionLimiter("test", 1, 1, 5.0, 2)
+        await limiter.acquire()
+        upstream = _Upstream()
+        events = await primed(ChatLLMService.__new__(ChatLLMService)._relay_stream(upstream, None, "hi"))
+
+        async def event_source():
+            async for event in events:
+                yield str(event)
+
+        await _disconnect_before_body(AdmittedStreamingResponse(limiter, event_source(), on_close=events.aclose))
+        return limiter, upstream
+
+    limiter, upstream = asyncio.run(scenario())
+    assert upstream.closed
+    assert limiter.active == 0
+
+
+def test_tts_upstream_closed_when_client_disconnects_before_body(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "TTS_STREAM_TEE_TO_CACHE", False)
+
+    async def scenario():
+        limiter = AdmissionLimiter("test", 1, 1, 5.0, 2)
+        await limiter.acquire()
+        service = SpeechService.__new__(SpeechService)
+        service.cache = type("Cache", (), {"path_for": staticmethod(lambda name: str(tmp_path / name))})()
+        upstream = _Upstream()
+        chunks = await primed(service._relay_speech(upstream, upstream, "a.mp3"))
+
+        await _disconnect_before_body(AdmittedStreamingResponse(limiter, chunks))
+        return limiter, upstream
+
+    limiter, upstream = asyncio.run(scenario())
+    assert upstream.closed
+    assert limiter.active == 0
@@ -0,0 +1,67 @@
+import pytest
+
+from app.micro_goals.task_index import TaskSet, _Entry, _jaccard
+
+
+def _task_set(*tasks, threshold: float = 0.6) -> TaskSet:
+    task_set = TaskSet(100, threshold)
+    task_set.add_many([{"title": title, "goal": goal} for title, goal in tasks])
+    return task_set
+
+
+def test_similarity_exactly_at_threshold_is_a_duplicate():
+    past, candidate = "Go for a 10,000-step walk", "Go for a 10000 step walk today"
+    similarity = _jaccard(_Entry(past, "").title_shingles, _Entry(candidate, "").title_shingles)
+    assert 0 < similarity < 1
+
+    assert _task_set((past, "")).find_duplicate(candidate, "") == past
+    assert _task_set((past, ""), threshold=similarity).find_duplicate(candidate, "") == past
+    assert _task_set((past, ""), threshold=similarity + 1e-9).find_duplicate(candidate, "") is None
+
+
+@pytest.mark.parametrize("title, goal", [
+    # Punctuation, case and number formatting
+    ("go for a 10000 step walk!", "Walk briskly around the neighbourhood"),
+    # Reworded title, nearly the same goal
+    ("10 minutes of meditation", "Sit quietly and focus on your breath"),
+])
+def test_reworded_tasks_are_duplicates(title, goal):
+    past = _task_set(
+        ("Go for a 10,000-step walk", "Walk briskly around the neighbourhood"),
+        ("Meditate for 10 minutes", "Sit quietly and focus on your breathing"),
+    )
+    assert past.find_duplicate(title, goal) is not None
+
+
+@pytest.mark.parametrize("title, goal", [
+    ("Call dad", "Catch up with your father on the phone"),
+    ("Practise mindfulness", "Notice five things you can see around you"),
+])
+def test_different_tasks_sharing_words_are_not_duplicates(title, goal):
+    past = _task_set(
+        ("Call mom", "Phone your mother and ask about her week"),
+        ("Meditate for 10 minutes", "Sit quietly and focus on your breathing"),
+    )
+    assert past.find_duplicate(title, goal) is None
+
+
+def test_short_titles():
+    past = _task_set(("Run", "Jog around the park"))
+    assert past.find_duplicate("Run", "Run on the treadmill") == "Run"
+    assert past.find_duplicate("run!", "") == "Run"
+    assert past.find_duplicate("Sun", "Sit outside for ten minutes") is None
+
+
+def test_empty_titles_compare_by_goal():
+    past = _task_set(("", "Walk the dog"))
+    assert past.find_duplicate("", "Walk the dog") == "Walk the dog"
+    assert past.find_duplicate("", "Call a friend") is None
+    assert past.find_duplicate("", "") is None
+    assert past.find_duplicate("", "", also_check=[{"title": "", "goal": ""}]) is None
+
+
+def test_also_check_covers_entries_accepted_in_the_same_plan():
+    past = _task_set()
+    accepted = [{"title": "Read a chapter", "goal": "Finish one chapter of a book"}]
+    assert past.find_duplicate("Read a chapter", "Finish a chapter of your book", also_check=accepted) == "Read a chapter"
+    assert past.find_duplicate("Read a chapter", "Finish a chapter of your book") is None
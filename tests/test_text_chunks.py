@@ -0,0 +1,65 @@
+import pytest
+
+from app.Voice_assistant.text_chunks import SentenceBuffer, pack_chunks, split_sentences
+
+
+def test_abbreviations_and_decimals_do_not_end_a_sentence():
+    text = "Dr. Smith said the tea costs 3.50 dollars, e.g. green tea. J. R. R. Tolkien liked it! Was it 2.5 km away?"
+    assert split_sentences(text, min_chars=0) == [
+        "Dr. Smith said the tea costs 3.50 dollars, e.g. green tea.",
+        "J. R. R. Tolkien liked it!",
+        "Was it 2.5 km away?",
+    ]
+
+
+def test_line_breaks_and_non_latin_terminators_end_a_sentence():
+    assert split_sentences("First line\nSecond line", min_chars=0) == ["First line", "Second line"]
+    assert split_sentences("你好。 再见！ नमस्ते। ठीक है", min_chars=0) == ["你好。", "再见！", "नमस्ते।", "ठीक है"]
+
+
+def test_short_sentences_merge_with_the_next():
+    assert split_sentences("Sure! Here is the plan for the rest of your day.") == [
+        "Sure! Here is the plan for the rest of your day."
+    ]
+
+
+def test_streamed_tokens_split_like_the_whole_text():
+    text = "Dr. Smith paid 3.50 dollars. That was a fair price for tea! Is it open tomorrow? Yes."
+    buffer = SentenceBuffer(min_chars=10)
+    streamed = []
+    # Token-sized pieces, cutting through "Dr.", "3.50" and the whitespace after periods
+    for i in range(0, len(text), 3):
+        streamed += buffer.feed(text[i:i + 3])
+    tail = buffer.flush()
+
+    assert streamed + [tail] == split_sentences(text, min_chars=10)
+    assert streamed == ["Dr. Smith paid 3.50 dollars.", "That was a fair price for tea!", "Is it open tomorrow?"]
+    assert tail == "Yes."
+
+
+def test_flush_returns_the_unfinished_remainder_once():
+    buffer = SentenceBuffer(min_chars=0)
+    assert buffer.feed("Done. Still typing") == ["Done."]
+    assert buffer.flush() == "Still typing"
+    assert buffer.flush() is None
+    # A sentence that ended but was too short to emit is also returned
+    buffer = SentenceBuffer(min_chars=40)
+    assert buffer.feed("Okay. ") == []
+    assert buffer.flush() == "Okay."
+
+
+def test_pack_chunks_groups_whole_sentences():
+    text = "One sentence here. Another one here. A third."
+    assert pack_chunks(text, 40) == ["One sentence here. Another one here.", "A third."]
+    assert pack_chunks(text, 1000) == [text]
+
+
+@pytest.mark.parametrize("max_chars", [10, 25, 60])
+def test_over_long_sentences_are_split_under_the_limit(max_chars):
+    long_sentence = " ".join(f"word{i}" for i in range(40)) + " https://example.com/" + "a" * 70 + "."
+    text = f"Short start. {long_sentence} Short end."
+    chunks = pack_chunks(text, max_chars)
+
+    assert all(0 < len(chunk) <= max_chars for chunk in chunks)
+    # Nothing lost or reordered
+    assert "".join(chunks).replace(" ", "") == text.replace(" ", "")